@@ -0,0 +1,356 @@
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+
+from telegram.constants import ParseMode
+from telegram.ext import CommandHandler
+
+from instruments import get_instruments
+from metrics import ALERT_CHECK_SECONDS, ALERTS_TRIGGERED, ERRORS
+from price_model import UNIT_DECIMALS, format_value, unit_label
+from price_parsing import parse_price
+
+logger = logging.getLogger(__name__)
+
+# Active alerts one chat may hold
+MAX_ALERTS_PER_CHAT = 20
+
+ABOVE = "above"
+BELOW = "below"
+DIRECTION_LABELS = {ABOVE: "بالای", BELOW: "زیر"}
+
+
+@dataclass(frozen=True, slots=True)
+class Alert:
+    """
+    One-shot alert: notify ``chat_id`` when ``key`` crosses ``threshold``
+    (an integer value in the instrument's unit) in ``direction``
+    """
+    id: int
+    chat_id: int
+    key: str
+    threshold: int
+    direction: str
+
+
+class ThresholdIndex:
+    """
+    Alert thresholds of one instrument and direction, kept sorted so the
+    alerts crossed by a price move are one contiguous slice
+    """
+    __slots__ = ("thresholds", "ids")
+
+    def __init__(self):
+        self.thresholds = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, threshold, alert_id):
+        position = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(position, threshold)
+        self.ids.insert(position, alert_id)
+
+    def remove(self, threshold, alert_id):
+        position = bisect_left(self.thresholds, threshold)
+        end = bisect_right(self.thresholds, threshold)
+        for index in range(position, end):
+            if self.ids[index] == alert_id:
+                del self.thresholds[index]
+                del self.ids[index]
+                return True
+        return False
+
+    def pop_slice(self, start, end):
+        """
+        Remove and return the IDs between two positions
+        """
+        ids = self.ids[start:end]
+        del self.thresholds[start:end]
+        del self.ids[start:end]
+        return ids
+
+    def pop_crossed(self, direction, previous, current):
+        """
+        IDs of the alerts crossed moving from ``previous`` to ``current``:
+        ``previous < threshold <= current`` going up,
+        ``current <= threshold < previous`` going down
+        """
+        if direction == ABOVE:
+            start = bisect_right(self.thresholds, previous)
+            end = bisect_right(self.thresholds, current)
+        else:
+            start = bisect_left(self.thresholds, current)
+            end = bisect_left(self.thresholds, previous)
+        if start >= end:
+            return []
+        return self.pop_slice(start, end)
+
+
+class AlertEngine:
+    """
+    Price-threshold alerts with per-instrument sorted indexes.
+
+    Each tick (``check()``) only visits the alerts whose threshold lies
+    between the previous and the current price of an instrument, so its
+    cost does not grow with the number of subscriptions. Alerts fire once
+    and are then removed. Subscriptions are kept in the ``alerts`` section
+    of the state store; the last seen prices are not, so moves that happen
+    while the bot is down do not trigger.
+    """
+
+    def __init__(self, store=None, max_per_chat=MAX_ALERTS_PER_CHAT):
+        self.store = store
+        self.max_per_chat = max_per_chat
+        self._alerts = {}
+        self._indexes = defaultdict(lambda: {ABOVE: ThresholdIndex(), BELOW: ThresholdIndex()})
+        self._per_chat = defaultdict(int)
+        self._last = {}
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self._alerts)
+
+    # Persistence
+
+    def _section(self):
+        return self.store.section("alerts") if self.store is not None else None
+
+    def load(self):
+        """
+        Rebuild the indexes from the state store
+        """
+        section = self._section()
+        if section is None:
+            return
+        items = section.setdefault("items", {})
+        for alert_id, (chat_id, key, threshold, direction) in items.items():
+            self._insert(Alert(int(alert_id), chat_id, key, threshold, direction))
+        self._next_id = max(section.get("next_id", 1), max(self._alerts, default=0) + 1)
+        logger.info(f"Loaded {len(self._alerts)} price alerts")
+
+    def _persist(self, added=(), removed=()):
+        section = self._section()
+        if section is None:
+            return
+        items = section.setdefault("items", {})
+        for alert in added:
+            items[str(alert.id)] = [alert.chat_id, alert.key, alert.threshold, alert.direction]
+        for alert in removed:
+            items.pop(str(alert.id), None)
+        section["next_id"] = self._next_id
+        self.store.mark_dirty()
+
+    # Subscriptions
+
+    def _insert(self, alert):
+        self._alerts[alert.id] = alert
+        self._indexes[alert.key][alert.direction].add(alert.threshold, alert.id)
+        self._per_chat[alert.chat_id] += 1
+
+    def _forget(self, alert):
+        del self._alerts[alert.id]
+        self._per_chat[alert.chat_id] -= 1
+        if not self._per_chat[alert.chat_id]:
+            del self._per_chat[alert.chat_id]
+
+    def add(self, chat_id, key, threshold, current):
+        """
+        Subscribe ``chat_id`` to ``key`` crossing ``threshold``; the direction
+        follows from the ``current`` price. Raises ValueError over the
+        per-chat limit.
+        """
+        if self._per_chat[chat_id] >= self.max_per_chat:
+            raise ValueError(f"chat {chat_id} already has {self.max_per_chat} alerts")
+        direction = ABOVE if threshold > current else BELOW
+        alert = Alert(self._next_id, chat_id, key, threshold, direction)
+        self._next_id += 1
+        self._insert(alert)
+        self._persist(added=(alert,))
+        return alert
+
+    def remove(self, chat_id, alert_id):
+        """
+        Cancel an alert of ``chat_id``; returns False if there is none
+        """
+        alert = self._alerts.get(alert_id)
+        if alert is None or alert.chat_id != chat_id:
+            return False
+        self._indexes[alert.key][alert.direction].remove(alert.threshold, alert_id)
+        self._forget(alert)
+        self._persist(removed=(alert,))
+        return True
+
+    def for_chat(self, chat_id):
+        return sorted(
+            (alert for alert in self._alerts.values() if alert.chat_id == chat_id),
+            key=lambda alert: alert.id,
+        )
+
+    # Ticks
+
+    def check(self, samples):
+        """
+        Feed ``(key, timestamp, value)`` samples; returns the alerts they
+        triggered, which are removed from the engine
+        """
+        with ALERT_CHECK_SECONDS.time():
+            triggered = []
+            for key, _, value in samples:
+                previous = self._last.get(key)
+                self._last[key] = value
+                if previous is None or previous == value or key not in self._indexes:
+                    continue
+                direction = ABOVE if value > previous else BELOW
+                for alert_id in self._indexes[key][direction].pop_crossed(direction, previous, value):
+                    alert = self._alerts[alert_id]
+                    self._forget(alert)
+                    triggered.append((alert, value))
+        if triggered:
+            ALERTS_TRIGGERED.inc(len(triggered))
+            self._persist(removed=[alert for alert, _ in triggered])
+        return triggered
+
+
+def format_threshold(alert, unit):
+    return f"{format_value(alert.threshold, unit)} {unit_label(unit)}"
+
+
+def format_alert_line(alert, instrument):
+    return (
+        f"#{alert.id} {instrument.display_name} "
+        f"{DIRECTION_LABELS[alert.direction]} {format_threshold(alert, instrument.unit)}"
+    )
+
+
+def format_triggered(triggered, instruments_by_key):
+    lines = ["🔔 <b>هشدار قیمت</b>"]
+    for alert, value in triggered:
+        instrument = instruments_by_key[alert.key]
+        lines.append(
+            f"{instrument.display_name} از {format_threshold(alert, instrument.unit)} "
+            f"{'بالاتر' if alert.direction == ABOVE else 'پایین‌تر'} رفت: "
+            f"{format_value(value, instrument.unit)} {unit_label(instrument.unit)}"
+        )
+    return "\n".join(lines)
+
+
+async def deliver(send_queue, triggered, instruments=None):
+    """
+    Send triggered alerts, one message per chat however many of its alerts
+    fired; the send queue applies the Bot API rate limits. Returns the
+    number of messages sent.
+    """
+    by_key = {instrument.key: instrument for instrument in instruments or get_instruments()}
+    by_chat = defaultdict(list)
+    for alert, value in triggered:
+        if alert.key in by_key:
+            by_chat[alert.chat_id].append((alert, value))
+
+    async def send(chat_id, items):
+        try:
+            await send_queue.send_message(
+                chat_id=chat_id, text=format_triggered(items, by_key), parse_mode=ParseMode.HTML
+            )
+            return True
+        except Exception as e:
+            ERRORS.inc(component="alert_delivery")
+            logger.error(f"Could not deliver {len(items)} alerts to {chat_id}: {e}")
+            return False
+
+    results = await asyncio.gather(*(send(chat_id, items) for chat_id, items in by_chat.items()))
+    return sum(results)
+
+
+def find_instrument(query, instruments=None):
+    """
+    Instrument whose key or display name matches ``query``, or None
+    """
+    query = (query or "").strip().lower()
+    if not query:
+        return None
+    for instrument in instruments or get_instruments():
+        if query == instrument.key or query == instrument.display_name:
+            return instrument
+    for instrument in instruments or get_instruments():
+        if query in instrument.key or query in instrument.display_name:
+            return instrument
+    return None
+
+
+def parse_threshold(text, instrument):
+    """
+    Integer threshold of a user-entered price (tomans for rial instruments), or None
+    """
+    value = parse_price(text, UNIT_DECIMALS.get(instrument.unit, 0))
+    if value is None or value <= 0:
+        return None
+    return value * 10 if instrument.unit == "rial" else value
+
+
+ALERT_USAGE = (
+    "استفاده: /alert نام قیمت\n"
+    "مثال: /alert دلار 110000 (قیمت به تومان)\n"
+    "/alerts فهرست هشدارها، /unalert شماره برای حذف"
+)
+
+
+def add_alert_handlers(application, engine, send_queue, price_cache):
+    """
+    Register /alert, /alerts and /unalert; replies go through ``send_queue``
+    """
+
+    async def reply(update, text):
+        await send_queue.send_message(
+            chat_id=update.effective_chat.id,
+            text=text,
+            reply_to_message_id=update.effective_message.message_id,
+            # Like /price, ahead of channel publishing
+            priority=True,
+        )
+
+    async def alert_command(update, context):
+        if not context.args or len(context.args) < 2:
+            await reply(update, ALERT_USAGE)
+            return
+        instrument = find_instrument(" ".join(context.args[:-1]))
+        if instrument is None:
+            await reply(update, f"نمادی با «{' '.join(context.args[:-1])}» پیدا نشد.")
+            return
+        threshold = parse_threshold(context.args[-1], instrument)
+        if threshold is None:
+            await reply(update, ALERT_USAGE)
+            return
+        cached = price_cache.get(instrument.key)
+        if cached is None:
+            await reply(update, "⏳ قیمت این نماد هنوز دریافت نشده، لطفاً کمی بعد دوباره امتحان کنید.")
+            return
+        try:
+            alert = engine.add(update.effective_chat.id, instrument.key, threshold, cached.price.value)
+        except ValueError:
+            await reply(update, f"حداکثر {engine.max_per_chat} هشدار فعال مجاز است.")
+            return
+        await reply(update, f"✅ هشدار ثبت شد: {format_alert_line(alert, instrument)}")
+
+    async def alerts_command(update, context):
+        by_key = {instrument.key: instrument for instrument in get_instruments()}
+        alerts = [alert for alert in engine.for_chat(update.effective_chat.id) if alert.key in by_key]
+        if not alerts:
+            await reply(update, "هشدار فعالی ندارید.\n" + ALERT_USAGE)
+            return
+        await reply(update, "\n".join(format_alert_line(alert, by_key[alert.key]) for alert in alerts))
+
+    async def unalert_command(update, context):
+        alert_id = parse_price(context.args[0].lstrip("#")) if context.args else None
+        if alert_id is None or not engine.remove(update.effective_chat.id, alert_id):
+            await reply(update, "هشداری با این شماره پیدا نشد.")
+            return
+        await reply(update, f"🗑 هشدار #{alert_id} حذف شد.")
+
+    application.add_handler(CommandHandler("alert", alert_command))
+    application.add_handler(CommandHandler("alerts", alerts_command))
+    application.add_handler(CommandHandler("unalert", unalert_command))
+
@@ -0,0 +1,145 @@
+"""
+Offline benchmark of the price alert engine with synthetic subscribers.
+
+Subscribes N synthetic chats to random thresholds around the dollar and
+Emami coin prices, then replays a random walk of price ticks. Reports the
+per-tick check latency of the sorted indexes against a naive scan over
+every alert, and delivers the triggered alerts through the real send queue
+to an in-process stub Bot API (one message per chat and tick).
+
+    python -m benchmarks.alerts --alerts 50000 --ticks 500
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from alerts import ABOVE, AlertEngine, deliver
+from benchmarks.end_to_end import StubBot
+from instruments import get_instruments
+from telegram_queue import SendQueue
+
+# Starting rial prices of the simulated instruments
+START_PRICES = {"dollar": 1_040_500, "emami_coin": 815_000_000}
+
+
+def naive_check(alerts, last, samples):
+    """
+    Reference implementation: visit every alert on every tick
+    """
+    triggered = []
+    for key, _, value in samples:
+        previous = last.get(key)
+        last[key] = value
+        if previous is None:
+            continue
+        for alert in list(alerts.values()):
+            if alert.key != key:
+                continue
+            crossed = (
+                previous < alert.threshold <= value if alert.direction == ABOVE
+                else value <= alert.threshold < previous
+            )
+            if crossed:
+                del alerts[alert.id]
+                triggered.append((alert, value))
+    return triggered
+
+
+def subscribe(engine, count, chats, spread, rng):
+    for _ in range(count):
+        key = rng.choice(list(START_PRICES))
+        start = START_PRICES[key]
+        threshold = int(start * (1 + rng.uniform(-spread, spread)))
+        engine.add(rng.randrange(chats), key, threshold, start)
+
+
+def price_walk(ticks, volatility, rng):
+    prices = dict(START_PRICES)
+    walk = [[(key, 0, value) for key, value in prices.items()]]
+    for tick in range(1, ticks + 1):
+        samples = []
+        for key in prices:
+            prices[key] = max(1, int(prices[key] * (1 + rng.gauss(0, volatility))))
+            samples.append((key, tick, prices[key]))
+        walk.append(samples)
+    return walk
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    engine = AlertEngine(max_per_chat=args.alerts)
+    started = time.perf_counter()
+    subscribe(engine, args.alerts, args.chats, args.spread, rng)
+    subscribe_seconds = time.perf_counter() - started
+    reference = dict(engine._alerts)
+    walk = price_walk(args.ticks, args.volatility, rng)
+
+    indexed, naive, batches = [], [], []
+    indexed_total = naive_total = 0
+    naive_last = {}
+    for samples in walk:
+        started = time.perf_counter()
+        triggered = engine.check(samples)
+        indexed.append(time.perf_counter() - started)
+        indexed_total += len(triggered)
+        if triggered:
+            batches.append(triggered)
+
+        if args.naive:
+            started = time.perf_counter()
+            expected = naive_check(reference, naive_last, samples)
+            naive.append(time.perf_counter() - started)
+            naive_total += len(expected)
+            if sorted(alert.id for alert, _ in expected) != sorted(alert.id for alert, _ in triggered):
+                raise SystemExit("indexed and naive checks disagree")
+
+    print(f"subscribed {args.alerts:,} alerts for {args.chats:,} chats in {subscribe_seconds * 1000:.1f} ms")
+    print(f"{args.ticks} ticks, {indexed_total:,} alerts triggered, {len(engine):,} still active")
+    print(f"indexed check per tick: p50 {statistics.median(indexed) * 1e6:.1f} us, "
+          f"p95 {percentile(indexed, 0.95) * 1e6:.1f} us, max {max(indexed) * 1e6:.1f} us")
+    if naive:
+        print(f"naive scan per tick:    p50 {statistics.median(naive) * 1e6:.1f} us, "
+              f"p95 {percentile(naive, 0.95) * 1e6:.1f} us, max {max(naive) * 1e6:.1f} us")
+    return batches
+
+
+async def deliver_all(batches, bot_latency):
+    stub = StubBot(latency=bot_latency)
+    # Rate limits are not under test here
+    bot = SendQueue(stub, global_rate=1e6, chat_rate_per_minute=1e6, chat_burst=1e6).start()
+    instruments = get_instruments(list(START_PRICES))
+    started = time.perf_counter()
+    messages = 0
+    for triggered in batches:
+        messages += await deliver(bot, triggered, instruments)
+    elapsed = time.perf_counter() - started
+    await bot.stop()
+    alerts = sum(len(triggered) for triggered in batches)
+    print(f"delivered {alerts:,} alerts in {messages:,} messages ({stub.calls}) in {elapsed:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=50_000)
+    parser.add_argument("--chats", type=int, default=10_000)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=0.05, help="thresholds within this fraction of the price")
+    parser.add_argument("--volatility", type=float, default=0.002, help="standard deviation of a tick's move")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="seconds added to every stub Bot API call")
+    parser.add_argument("--no-naive", dest="naive", action="store_false", help="skip the naive scan comparison")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    batches = run(args)
+    asyncio.run(deliver_all(batches, args.bot_latency))
+
+
+if __name__ == "__main__":
+    main()
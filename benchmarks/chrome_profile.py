@@ -0,0 +1,105 @@
+"""
+Compare the full and the lean Chrome browsing profiles.
+
+Opens every tracked page with a driver of each profile and reports, from
+the DevTools network events, the bytes transferred and the requests made
+and blocked, next to the time until the prices were ready.
+
+    python -m benchmarks.chrome_profile --iterations 3
+    python -m benchmarks.chrome_profile --fixtures   # recorded pages, offline
+"""
+import argparse
+import json
+import os
+import statistics
+
+PROFILES = (("full", False), ("lean", True))
+
+
+def network_usage(driver):
+    """
+    Bytes received, requests made and requests blocked since the last call,
+    from the driver's performance log
+    """
+    transferred = requests = blocked = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        method = message.get("method")
+        params = message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            requests += 1
+        elif method == "Network.loadingFinished":
+            transferred += params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            blocked += 1
+    return transferred, requests, blocked
+
+
+def run_profile(lean, iterations, pages, headless=True):
+    import price_extractor_v2
+
+    driver = price_extractor_v2.setup_driver(headless=headless, lean=lean, performance_log=True)
+    rows = {}
+    try:
+        for url, instruments in pages.items():
+            element_ids = [instrument.element_id for instrument in instruments]
+            samples = []
+            for _ in range(iterations):
+                # Start each load cold and with an empty log
+                driver.delete_all_cookies()
+                driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+                network_usage(driver)
+                ready_via = price_extractor_v2.open_page(driver, url, element_ids)
+                timings = price_extractor_v2.page_load_timings[url]
+                samples.append((timings["total"], *network_usage(driver), ready_via))
+            rows[url] = {
+                "ready_s": statistics.median(sample[0] for sample in samples),
+                "kb": statistics.median(sample[1] for sample in samples) / 1024,
+                "requests": statistics.median(sample[2] for sample in samples),
+                "blocked": statistics.median(sample[3] for sample in samples),
+                "ready_via": samples[-1][4],
+            }
+    finally:
+        driver.quit()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--fixtures", action="store_true", help="serve benchmarks/fixtures/ instead of tgju.org")
+    parser.add_argument("--show-browser", action="store_true")
+    args = parser.parse_args()
+
+    server = None
+    if args.fixtures:
+        from benchmarks.end_to_end import start_fixture_server
+        server = start_fixture_server()
+        # Configuration is read at import time
+        os.environ["TGJU_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    from instruments import get_instruments, group_by_page
+
+    pages = group_by_page(get_instruments())
+    results = {}
+    try:
+        for name, lean in PROFILES:
+            results[name] = run_profile(lean, args.iterations, pages, headless=not args.show_browser)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(f"{'page':<40}{'profile':<9}{'ready s':>9}{'KB':>10}{'requests':>10}{'blocked':>9}  ready via")
+    for url in pages:
+        for name, _ in PROFILES:
+            row = results[name][url]
+            print(f"{url:<40}{name:<9}{row['ready_s']:>9.2f}{row['kb']:>10.1f}"
+                  f"{row['requests']:>10.0f}{row['blocked']:>9.0f}  {row['ready_via']}")
+    for name, _ in PROFILES:
+        rows = results[name].values()
+        print(f"{name}: {sum(row['kb'] for row in rows):.1f} KB, "
+              f"{sum(row['ready_s'] for row in rows):.2f} s until ready over {len(pages)} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare the single-script DOM extraction with the per-element walk.
+
+Each page is opened once, then both modes extract from the same DOM while
+every WebDriver command is counted. Every mode runs twice: with the
+instruments' real element IDs, and with IDs that do not exist on the page
+("fallback"), so the lookup goes on to the market tables and
+.market-table-row entries as it does when tgju renames a ticker.
+
+    python -m benchmarks.dom_extraction --iterations 5
+"""
+import argparse
+import dataclasses
+import statistics
+import time
+
+from instruments import INSTRUMENTS, get_instruments, group_by_page
+from price_extractor_v2 import (
+    DOM_EXTRACTION_MODES,
+    extract_page,
+    open_page,
+    setup_driver,
+)
+
+
+class RoundTripCounter:
+    """
+    Count WebDriver commands by wrapping driver.execute (WebElement calls go through it too)
+    """
+
+    def __init__(self, driver):
+        self.count = 0
+        original_execute = driver.execute
+
+        def execute(*args, **kwargs):
+            self.count += 1
+            return original_execute(*args, **kwargs)
+
+        driver.execute = execute
+
+
+# Element ID prefix that matches nothing on the tgju pages
+MISSING_ID_PREFIX = "benchmark-missing-"
+
+
+def with_missing_ids(instruments):
+    """
+    Copies of ``instruments`` whose element IDs are not on the page
+    """
+    return [
+        dataclasses.replace(instrument, element_id=MISSING_ID_PREFIX + instrument.element_id)
+        for instrument in instruments
+    ]
+
+
+def run(iterations, instruments, headless=True):
+    driver = setup_driver(headless=headless)
+    counter = RoundTripCounter(driver)
+    results = []
+    try:
+        for url, page_instruments in group_by_page(instruments).items():
+            open_page(driver, url, [instrument.element_id for instrument in page_instruments])
+            for lookup, lookup_instruments in (("id", page_instruments),
+                                               ("fallback", with_missing_ids(page_instruments))):
+                for mode in DOM_EXTRACTION_MODES:
+                    latencies = []
+                    round_trips = []
+                    for _ in range(iterations):
+                        counter.count = 0
+                        started = time.perf_counter()
+                        found = extract_page(driver, lookup_instruments, mode=mode)
+                        latencies.append(time.perf_counter() - started)
+                        round_trips.append(counter.count)
+                    results.append({
+                        "page": url.rsplit("/", 1)[-1],
+                        "lookup": lookup,
+                        "mode": mode,
+                        "found": f"{len(found)}/{len(lookup_instruments)}",
+                        "round_trips": statistics.median(round_trips),
+                        "p50_ms": statistics.median(latencies) * 1000,
+                        "max_ms": max(latencies) * 1000,
+                    })
+    finally:
+        driver.quit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument(
+        "--instrument", action="append",
+        choices=[instrument.key for instrument in INSTRUMENTS],
+        help="instrument to extract (default: tracked instruments)",
+    )
+    parser.add_argument("--no-headless", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.iterations, get_instruments(args.instrument), headless=not args.no_headless)
+    print(f"{'page':<12}{'lookup':<10}{'mode':<8}{'found':>6}{'round trips':>12}{'p50 ms':>10}{'max ms':>10}")
+    for row in results:
+        print(
+            f"{row['page']:<12}{row['lookup']:<10}{row['mode']:<8}{row['found']:>6}{row['round_trips']:>12}"
+            f"{row['p50_ms']:>10.1f}{row['max_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""
+Offline end-to-end benchmark against recorded tgju pages.
+
+Serves benchmarks/fixtures/ (see benchmarks.record_fixtures) from a local
+HTTP server, points the scraper at it through TGJU_BASE_URL and measures,
+for N iterations each:
+
+- every extraction engine on every page (http, selenium script/walk) and
+  the JSON feed engine on the recorded ajax.json
+- the full get_all_prices() cycle
+- main.update_price_message() publishing to a stub Bot API
+
+It checks that the feed engine decodes the same values as the page
+engine, reports p50/p95 latency, peak RSS and Chrome process counts, and
+compares the results with benchmarks/baselines.json. The baselines are
+scaled by a fixed CPU workload timed in the same run, so they carry over
+to faster or slower hosts; stages slower by less than
+MIN_REGRESSION_MS are not counted as regressions.
+
+    python -m benchmarks.end_to_end --iterations 20
+    python -m benchmarks.end_to_end --engine http --save-baseline
+    python -m benchmarks.end_to_end --check   # exit 1 on regressions
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from html.parser import HTMLParser
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+BASELINES_FILE = os.path.join(BENCHMARKS_DIR, "baselines.json")
+DEFAULT_TOLERANCE = 0.5
+# Slowdowns smaller than this are timer and scheduler noise, whatever their
+# percentage (the feed stages take a few milliseconds)
+MIN_REGRESSION_MS = 5.0
+# Runs of the calibration workload before and after the stages; the fastest
+# one is least affected by other load on the host
+CALIBRATION_SAMPLES = 30
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """
+    Serve /<page> from fixtures/<page>.html, optionally after a fixed delay
+    """
+    latency = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=FIXTURES_DIR, **kwargs)
+
+    def translate_path(self, path):
+        path = path.split("?", 1)[0].rstrip("/")
+        if not os.path.splitext(path)[1]:
+            path += ".html"
+        return super().translate_path(path)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(latency=0.0):
+    handler = type("Handler", (FixtureHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="fixtures", daemon=True).start()
+    return server
+
+
+class StubBot:
+    """
+    In-process stand-in for telegram.Bot with a fixed per-call latency
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._next_message_id = 1000
+
+    async def _call(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call("send_message")
+        self._next_message_id += 1
+        return SimpleNamespace(message_id=self._next_message_id, chat_id=chat_id, text=text)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        await self._call("edit_message_text")
+        return SimpleNamespace(message_id=message_id, chat_id=chat_id, text=text)
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        await self._call("delete_message")
+        return True
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await self._call("delete_messages")
+        return True
+
+
+def chrome_processes():
+    """
+    Number of running Chrome/chromedriver processes (Linux /proc), or None
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    count = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().split(b"\0", 1)[0]
+        except OSError:
+            continue
+        if b"chrom" in os.path.basename(cmdline):
+            count += 1
+    return count
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and of its (waited) children, in MB
+    """
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "iterations": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class Sampler:
+    """
+    Track the highest Chrome process count seen between iterations
+    """
+
+    def __init__(self):
+        self.max_chrome = chrome_processes()
+
+    def sample(self):
+        count = chrome_processes()
+        if count is not None and (self.max_chrome is None or count > self.max_chrome):
+            self.max_chrome = count
+
+
+def verify_feed():
+    """
+    Compare the values the feed engine decodes from the recorded feed with
+    those the http engine reads from the recorded pages, and check that a
+    payload without "current" is reported as a schema change; returns the
+    keys that differ ("schema" for the latter)
+    """
+    import feed_extractor
+    import http_extractor
+    from benchmarks.record_fixtures import FEED_FIXTURE, PAGES, fixture_sources
+    from instruments import INSTRUMENTS, group_by_page, page_targets
+    from price_model import parse_instrument_value
+
+    sources = fixture_sources()
+    not_live = [
+        fixture for fixture in (FEED_FIXTURE, *(f"{page}.html" for page in PAGES))
+        if sources.get(fixture, {}).get("source") != "live"
+    ]
+    if not_live:
+        # A synthetic feed is generated from the same symbols the check derives
+        print(f"warning: {', '.join(not_live)} not recorded from tgju.org, so a match does not confirm "
+              f"the symbol mapping; run python -m benchmarks.record_fixtures to record them")
+
+    feed_found, feed_missing = feed_extractor.get_prices(INSTRUMENTS, max_age=0)
+    page_found = {}
+    for url, instruments in group_by_page(INSTRUMENTS).items():
+        page_found.update(http_extractor.get_page_prices(url, page_targets(instruments))[0])
+    mismatches = list(feed_missing)
+    for instrument in INSTRUMENTS:
+        if instrument.key in feed_missing:
+            continue
+        feed_value = parse_instrument_value(instrument, feed_found[instrument.key])
+        page_value = parse_instrument_value(instrument, page_found.get(instrument.key))
+        if feed_value != page_value:
+            print(f"feed mismatch for {instrument.key}: feed {feed_value}, page {page_value}")
+            mismatches.append(instrument.key)
+    try:
+        feed_extractor.decode_prices({"last": []}, {INSTRUMENTS[0].key: feed_extractor.feed_symbol(INSTRUMENTS[0])})
+        print("feed schema check: a payload without 'current' was decoded instead of raising FeedSchemaError")
+        mismatches.append("schema")
+    except feed_extractor.FeedSchemaError:
+        pass
+    print(f"feed fixture: {len(feed_found)}/{len(INSTRUMENTS)} instruments decoded, {len(mismatches)} mismatches")
+    return mismatches
+
+
+def bench_feed(iterations, sampler):
+    import feed_extractor
+    from instruments import get_instruments
+
+    instruments = get_instruments()
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        # One uncached request covers every page
+        found, missing = feed_extractor.get_prices(instruments, max_age=0)
+        latencies.append(time.perf_counter() - started)
+        sampler.sample()
+    if missing:
+        print(f"warning: engine_feed missed {missing}")
+    return {"engine_feed": summarize(latencies)}
+
+
+def bench_engines(iterations, engines, sampler):
+    import price_extractor_v2
+    from instruments import get_instruments, group_by_page
+
+    results = {}
+    pages = group_by_page(get_instruments())
+    for engine in engines:
+        if engine == "feed":
+            results.update(bench_feed(iterations, sampler))
+            continue
+        if engine == "selenium":
+            # Page errors are swallowed by the extractor, so check for Chrome up front
+            try:
+                price_extractor_v2.setup_driver().quit()
+            except Exception as e:
+                print(f"skipping selenium engine: {e}")
+                continue
+        variants = [("script", "script"), ("walk", "walk")] if engine == "selenium" else [(None, None)]
+        for label, mode in variants:
+            name = f"engine_{engine}" + (f"_{label}" if label else "")
+            if mode is not None:
+                os.environ["DOM_EXTRACTION"] = mode
+            try:
+                for url, instruments in pages.items():
+                    latencies = []
+                    for _ in range(iterations):
+                        started = time.perf_counter()
+                        found = price_extractor_v2.get_page_prices(url, instruments, engine=engine)
+                        latencies.append(time.perf_counter() - started)
+                        sampler.sample()
+                    if len(found) < len(instruments):
+                        print(f"warning: {name} found {len(found)}/{len(instruments)} on {url}")
+                    results[f"{name}_{url.rsplit('/', 1)[-1]}"] = summarize(latencies)
+            except Exception as e:
+                print(f"skipping {name}: {e}")
+            finally:
+                os.environ.pop("DOM_EXTRACTION", None)
+    return results
+
+
+def bench_get_all_prices(iterations, engine, sampler):
+    import feed_extractor
+    import price_extractor_v2
+
+    latencies = []
+    for _ in range(iterations):
+        # Real cycles are further apart than the feed cache lifetime
+        feed_extractor.clear_cache()
+        started = time.perf_counter()
+        prices = price_extractor_v2.get_all_prices(engine=engine)
+        latencies.append(time.perf_counter() - started)
+        sampler.sample()
+    if not prices:
+        print("warning: get_all_prices returned no prices")
+    return {f"get_all_prices_{engine}": summarize(latencies)}
+
+
+def calibrate(samples=CALIBRATION_SAMPLES):
+    """
+    Time a fixed workload (decoding the feed fixture and tokenizing a page
+    fixture) to measure how fast this host runs the scraper's kind of work
+    """
+    with open(os.path.join(FIXTURES_DIR, "currency.html"), "r", encoding="utf-8") as f:
+        page = f.read()
+    with open(os.path.join(FIXTURES_DIR, "ajax.json"), "rb") as f:
+        feed = f.read()
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        json.loads(feed)
+        parser = HTMLParser()
+        parser.feed(page)
+        parser.close()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def bench_update(iterations, bot_latency, sampler):
+    import main as bot_main
+    from telegram_queue import SendQueue
+
+    async def run():
+        stub = StubBot(latency=bot_latency)
+        # Rate limits are not under test here
+        bot = SendQueue(stub, global_rate=1e6, chat_rate_per_minute=1e6, chat_burst=1e6).start()
+        latencies = []
+        for index in range(iterations):
+            started = time.perf_counter()
+            await bot_main.update_price_message(bot, force_new=index == 0)
+            latencies.append(time.perf_counter() - started)
+            sampler.sample()
+        await asyncio.gather(*bot_main.background_tasks)
+        await bot.stop()
+        return latencies, stub.calls
+
+    latencies, calls = asyncio.run(run())
+    print(f"stub Bot API calls: {calls}")
+    return {"update_price_message": summarize(latencies)}
+
+
+def compare(results, baselines, tolerance):
+    """
+    Print each result next to its baseline, scaled by the calibration
+    workload of both runs; returns the names that regressed
+    """
+    scale = 1.0
+    calibration = results.get("calibration", {}).get("min_ms")
+    base_calibration = baselines.get("calibration", {}).get("min_ms")
+    if calibration and base_calibration:
+        scale = calibration / base_calibration
+    print(f"baselines scaled by {scale:.2f} for this host's speed")
+    regressions = []
+    print(f"{'benchmark':<40}{'p50 ms':>10}{'p95 ms':>10}{'base p50':>10}{'delta':>9}")
+    for name, row in results.items():
+        if not isinstance(row, dict) or "p50_ms" not in row:
+            continue
+        base = baselines.get(name, {}).get("p50_ms")
+        delta = ""
+        if base:
+            base *= scale
+            change = row["p50_ms"] / base - 1
+            delta = f"{change:+.0%}"
+            if change > tolerance and row["p50_ms"] - base > MIN_REGRESSION_MS:
+                regressions.append(name)
+                delta += " !"
+        base_text = f"{base:.2f}" if base else "-"
+        print(f"{name:<40}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{base_text:>10}{delta:>9}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument(
+        "--engine", action="append", choices=("http", "selenium", "feed"),
+        help="engines to benchmark (default: all)",
+    )
+    parser.add_argument("--page-latency", type=float, default=0.0, help="seconds added to every fixture response")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="seconds added to every stub Bot API call")
+    parser.add_argument("--baselines", default=BASELINES_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a p50 regressed beyond --tolerance")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+    engines = args.engine or ["http", "selenium", "feed"]
+
+    if not os.path.exists(os.path.join(FIXTURES_DIR, "currency.html")):
+        parser.error("no fixtures found, run python -m benchmarks.record_fixtures [--synthetic] first")
+
+    server = start_fixture_server(args.page_latency)
+    workdir = tempfile.TemporaryDirectory()
+    # Configuration is read at import time, so set it before importing the bot
+    os.environ["TGJU_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["TGJU_FEED_URL"] = f"http://127.0.0.1:{server.server_address[1]}/ajax.json"
+    os.environ.setdefault("CHANNEL_IDS", "@bench_one,@bench_two")
+    os.environ["STATE_FILE"] = os.path.join(workdir.name, "bot_state.json")
+    os.environ["HISTORY_DIR"] = os.path.join(workdir.name, "history")
+
+    sampler = Sampler()
+    chrome_before = sampler.max_chrome
+    results = {}
+    feed_mismatches = []
+    try:
+        if "feed" in engines:
+            feed_mismatches = verify_feed()
+        calibration = calibrate()
+        results.update(bench_engines(args.iterations, engines, sampler))
+        for engine in ("http", "feed"):
+            if engine == "http" or engine in engines:
+                results.update(bench_get_all_prices(args.iterations, engine, sampler))
+        results.update(bench_update(args.iterations, args.bot_latency, sampler))
+        calibration += calibrate()
+        results["calibration"] = {"samples": len(calibration), "min_ms": round(min(calibration) * 1000, 2)}
+    finally:
+        import price_extractor_v2
+        price_extractor_v2.close_driver_pools()
+        server.shutdown()
+        workdir.cleanup()
+
+    import http_extractor
+    own_rss, children_rss = peak_rss_mb()
+    results["environment"] = {
+        "python": sys.version.split()[0],
+        "html_parser": http_extractor.HTML_PARSER,
+        "iterations": args.iterations,
+    }
+    results["resources"] = {
+        "peak_rss_mb": own_rss,
+        "peak_children_rss_mb": children_rss,
+        "chrome_processes_before": chrome_before,
+        "chrome_processes_peak": sampler.max_chrome,
+        "chrome_processes_after": chrome_processes(),
+    }
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    regressions = compare(results, baselines, args.tolerance)
+    print(f"resources: {results['resources']}")
+
+    if args.save_baseline:
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baselines}")
+    if regressions:
+        print(f"regressions over {args.tolerance:.0%}: {regressions}")
+    if feed_mismatches:
+        print(f"feed engine disagrees with the pages on: {feed_mismatches}")
+    if args.check and (regressions or feed_mismatches):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Local stand-in for the Telegram Bot API, for load-testing the publisher.
+
+Implements sendMessage, editMessageText, deleteMessage and deleteMessages
+with in-memory chats, and can inject latency, errors and 429 retry_after
+responses (randomly or through a per-chat messages-per-minute limit).
+getMe, deleteWebhook, getUpdates (long polling over updates queued with
+FakeBotApi.add_update()) and answerInlineQuery let the command service
+run against it too. Point the bot at it with
+TELEGRAM_BASE_URL=http://127.0.0.1:<port>/bot.
+
+    python -m benchmarks.fake_bot_api --port 8081 --latency 0.05 --retry-after-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Longest getUpdates long poll, whatever timeout the client asks for
+MAX_POLL_SECONDS = 10.0
+BOT_USER = {
+    "id": 100000001, "is_bot": True, "first_name": "Fake Bot", "username": "fake_bot",
+    "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": True,
+}
+
+
+class FakeBotApi:
+    """
+    Chat state, fault injection settings and call statistics of the fake server
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, retry_after_rate=0.0,
+                 retry_after=1, chat_limit_per_minute=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.chat_limit_per_minute = chat_limit_per_minute
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_message_id = defaultdict(lambda: 1)
+        self._messages = defaultdict(dict)
+        self._chat_sends = defaultdict(deque)
+        self._updates = deque()
+        self._updates_ready = threading.Condition(self._lock)
+        self._next_update_id = 1
+        self.stats = defaultdict(int)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    # Fault injection
+
+    def _delay(self):
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+    def _rate_limited(self, chat_id, now):
+        """
+        Seconds to wait if ``chat_id`` is over its per-minute limit, else None
+        """
+        if self.chat_limit_per_minute is None:
+            return None
+        sends = self._chat_sends[chat_id]
+        while sends and now - sends[0] >= 60:
+            sends.popleft()
+        if len(sends) >= self.chat_limit_per_minute:
+            return max(1, int(60 - (now - sends[0])) + 1)
+        sends.append(now)
+        return None
+
+    def _fault(self, method, chat_id):
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.retry_after_rate:
+                return 429, self.retry_after
+            if roll < self.retry_after_rate + self.error_rate:
+                return 500, None
+            if method in ("sendMessage", "editMessageText"):
+                retry_after = self._rate_limited(chat_id, time.monotonic())
+                if retry_after is not None:
+                    return 429, retry_after
+        return None
+
+    # Bot API methods
+
+    @staticmethod
+    def _chat(chat_id):
+        if isinstance(chat_id, str) and chat_id.startswith("@"):
+            return {"id": -1000000000000 - zlib.crc32(chat_id.encode()), "type": "channel", "username": chat_id[1:]}
+        return {"id": int(chat_id), "type": "channel"}
+
+    def _message(self, chat_id, message_id, text):
+        return {"message_id": message_id, "date": int(time.time()), "chat": self._chat(chat_id), "text": text}
+
+    def send_message(self, params):
+        chat_id = params["chat_id"]
+        with self._lock:
+            message_id = self._next_message_id[chat_id]
+            self._next_message_id[chat_id] += 1
+            self._messages[chat_id][message_id] = params.get("text", "")
+        return 200, self._message(chat_id, message_id, params.get("text", ""))
+
+    def edit_message_text(self, params):
+        chat_id = params["chat_id"]
+        message_id = int(params["message_id"])
+        text = params.get("text", "")
+        with self._lock:
+            messages = self._messages[chat_id]
+            if message_id not in messages:
+                return 400, "Bad Request: message to edit not found"
+            if messages[message_id] == text:
+                return 400, ("Bad Request: message is not modified: specified new message content "
+                             "and reply markup are exactly the same as a current content and reply "
+                             "markup of the message")
+            messages[message_id] = text
+        return 200, self._message(chat_id, message_id, text)
+
+    def delete_message(self, params):
+        with self._lock:
+            if self._messages[params["chat_id"]].pop(int(params["message_id"]), None) is None:
+                return 400, "Bad Request: message to delete not found"
+        return 200, True
+
+    def delete_messages(self, params):
+        message_ids = params["message_ids"]
+        if len(message_ids) > 100:
+            return 400, "Bad Request: too many messages to delete"
+        with self._lock:
+            messages = self._messages[params["chat_id"]]
+            for message_id in message_ids:
+                messages.pop(int(message_id), None)
+        return 200, True
+
+    def answer_inline_query(self, params):
+        return 200, True
+
+    METHODS = {
+        "sendMessage": send_message,
+        "editMessageText": edit_message_text,
+        "deleteMessage": delete_message,
+        "deleteMessages": delete_messages,
+        "answerInlineQuery": answer_inline_query,
+    }
+
+    # Updates
+
+    def add_update(self, text, chat_id=1):
+        """
+        Queue a private message from user ``chat_id`` for getUpdates, e.g. "/price dollar"
+        """
+        message = {
+            "message_id": 0,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        with self._updates_ready:
+            message["message_id"] = self._next_message_id[chat_id]
+            self._next_message_id[chat_id] += 1
+            self._updates.append({"update_id": self._next_update_id, "message": message})
+            self._next_update_id += 1
+            self._updates_ready.notify_all()
+
+    def get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        deadline = time.monotonic() + min(float(params.get("timeout") or 0), MAX_POLL_SECONDS)
+        with self._updates_ready:
+            while True:
+                # An offset confirms every update before it
+                while self._updates and self._updates[0]["update_id"] < offset:
+                    self._updates.popleft()
+                remaining = deadline - time.monotonic()
+                if self._updates or remaining <= 0:
+                    return 200, list(self._updates)
+                self._updates_ready.wait(remaining)
+
+    # Outside fault injection and the in-flight count, as a long poll would skew both
+    SERVICE_METHODS = {
+        "getMe": lambda self, params: (200, BOT_USER),
+        "deleteWebhook": lambda self, params: (200, True),
+        "getUpdates": get_updates,
+    }
+
+    def handle(self, method, params):
+        """
+        Returns ``(http_status, response_body_dict)``
+        """
+        service = self.SERVICE_METHODS.get(method)
+        if service is not None:
+            with self._lock:
+                self.stats[method] += 1
+            return 200, {"ok": True, "result": service(self, params)[1]}
+        handler = self.METHODS.get(method)
+        if handler is None:
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+
+        with self._lock:
+            self.stats[method] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self._delay()
+            fault = self._fault(method, params.get("chat_id"))
+            if fault is not None:
+                status, retry_after = fault
+                with self._lock:
+                    self.stats[f"{method}_{status}"] += 1
+                if status == 429:
+                    return 429, {
+                        "ok": False, "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after},
+                    }
+                return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+
+            status, result = handler(self, params)
+            if status != 200:
+                with self._lock:
+                    self.stats[f"{method}_{status}"] += 1
+                return status, {"ok": False, "error_code": status, "description": result}
+            return 200, {"ok": True, "result": result}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["max_in_flight"] = self.max_in_flight
+            stats["live_messages"] = sum(len(messages) for messages in self._messages.values())
+            return stats
+
+
+def _parse_params(content_type, body):
+    """
+    Request parameters from a JSON or form encoded body; form values that
+    hold JSON (e.g. message_ids) are decoded
+    """
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    params = {}
+    for key, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items():
+        value = values[-1]
+        if value[:1] in "[{":
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        params[key] = value
+    return params
+
+
+class _Handler(BaseHTTPRequestHandler):
+    api = None
+    protocol_version = "HTTP/1.1"
+
+    def _dispatch(self):
+        # Paths look like /bot<token>/<method>
+        method = self.path.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            params = _parse_params(self.headers.get("Content-Type", ""), body)
+        except ValueError:
+            status, payload = 400, {"ok": False, "error_code": 400, "description": "Bad Request: invalid body"}
+        else:
+            status, payload = self.api.handle(method, params)
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_POST = _dispatch
+    do_GET = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(api, host="127.0.0.1", port=0):
+    """
+    Serve ``api`` from a daemon thread; the base URL is
+    ``http://host:<server.server_address[1]>/bot``
+    """
+    handler = type("Handler", (_Handler,), {"api": api})
+    # The default listen backlog of 5 resets bursts of new client connections
+    server_class = type("Server", (ThreadingHTTPServer,), {"request_queue_size": 1024, "daemon_threads": True})
+    server = server_class((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="fake-bot-api", daemon=True).start()
+    return server
+
+
+def add_fault_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after of injected 429s")
+    parser.add_argument("--chat-limit", type=int, default=None,
+                        help="sends/edits per chat per minute before answering 429")
+
+
+def api_from_arguments(args, seed=None):
+    return FakeBotApi(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=args.retry_after,
+        chat_limit_per_minute=args.chat_limit,
+        seed=seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(api_from_arguments(args), args.host, args.port)
+    print(f"fake Bot API on TELEGRAM_BASE_URL=http://{args.host}:{server.server_address[1]}/bot")
+    try:
+        while True:
+            time.sleep(10)
+            print(server.RequestHandlerClass.api.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Load-test the publisher against the local fake Bot API.
+
+Publishes a price message to thousands of simulated channels through the
+real send queue and python-telegram-bot HTTP stack: the first round posts
+new messages, later rounds edit them. Reports per-round throughput, queue
+wait and depth (backpressure), retries and failures, and the end-to-end
+latency of a priority /price-style reply sent while the round is queued.
+
+    python -m benchmarks.publisher_load --channels 2000 --rounds 3
+    python -m benchmarks.publisher_load --channels 500 --latency 0.05 --retry-after-rate 0.02
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.fake_bot_api import add_fault_arguments, api_from_arguments, start_server
+
+
+async def sample_depth(bot, peak, interval=0.05):
+    while True:
+        peak["depth"] = max(peak["depth"], bot.metrics()["depth"])
+        await asyncio.sleep(interval)
+
+
+async def run(args, base_url):
+    # Configuration is read at import time
+    import main as bot_main
+
+    bot = bot_main.create_bot(
+        token="123456:LOADTEST",
+        base_url=base_url,
+        global_rate=args.global_rate,
+        chat_rate_per_minute=args.chat_rate,
+        max_in_flight=args.max_in_flight,
+    )
+    rounds = []
+    for index in range(args.rounds):
+        peak = {"depth": 0}
+        sampler = asyncio.create_task(sample_depth(bot, peak))
+        before = bot.metrics()
+        started = time.perf_counter()
+        publish = asyncio.create_task(bot_main.publish_message(
+            bot, f"💵 load test round {index} 💵", ("round", index), force_new=index == 0
+        ))
+        # A user reply arriving once the round has filled the queue
+        await asyncio.sleep(0.2)
+        reply_started = time.perf_counter()
+        await bot.send_message(chat_id=42, text="📊 reply", priority=True)
+        reply_seconds = time.perf_counter() - reply_started
+        ok = await publish
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        after = bot.metrics()
+        rounds.append({
+            "round": index,
+            "kind": "send" if index == 0 else "edit",
+            "seconds": round(elapsed, 2),
+            "per_second": round(args.channels / elapsed, 1),
+            "all_ok": ok,
+            "dispatched": after["dispatched"] - before["dispatched"],
+            "retry_after": after["retry_after"] - before["retry_after"],
+            "failed": after["failed"] - before["failed"],
+            "peak_depth": peak["depth"],
+            "wait_p95": after.get("wait_p95"),
+            "wait_max": after.get("wait_max"),
+            "reply_ms": round(reply_seconds * 1000, 1),
+        })
+    if bot_main.background_tasks:
+        await asyncio.gather(*bot_main.background_tasks)
+    await bot.stop()
+    return rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--global-rate", type=float, default=30.0, help="send queue requests per second")
+    parser.add_argument("--chat-rate", type=float, default=20.0, help="send queue requests per chat per minute")
+    parser.add_argument("--max-in-flight", type=int, default=20)
+    parser.add_argument("--publish-concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    api = api_from_arguments(args, seed=args.seed)
+    server = start_server(api)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/bot"
+
+    workdir = tempfile.TemporaryDirectory()
+    os.environ["CHANNEL_IDS"] = ",".join(f"@load_{index}" for index in range(args.channels))
+    os.environ["PUBLISH_CONCURRENCY"] = str(args.publish_concurrency)
+    os.environ["STATE_FILE"] = os.path.join(workdir.name, "bot_state.json")
+    os.environ["HISTORY_DIR"] = os.path.join(workdir.name, "history")
+    # Per-channel INFO lines would dominate the run
+    logging.disable(logging.WARNING)
+
+    try:
+        rounds = asyncio.run(run(args, base_url))
+    finally:
+        server.shutdown()
+        workdir.cleanup()
+
+    print(f"{'round':<7}{'kind':<6}{'seconds':>9}{'msg/s':>9}{'retry':>7}{'failed':>8}"
+          f"{'depth':>7}{'wait p95':>10}{'wait max':>10}{'reply ms':>10}")
+    for row in rounds:
+        print(
+            f"{row['round']:<7}{row['kind']:<6}{row['seconds']:>9.2f}{row['per_second']:>9.1f}"
+            f"{row['retry_after']:>7}{row['failed']:>8}{row['peak_depth']:>7}"
+            f"{row['wait_p95'] or 0:>10.3f}{row['wait_max'] or 0:>10.3f}{row['reply_ms']:>10.1f}"
+        )
+    print(f"fake Bot API: {api.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Record tgju pages as offline fixtures for the benchmarks.
+
+By default the live currency, gold and coin pages and the JSON live-data
+feed (ajax.json) are downloaded into benchmarks/fixtures/. With
+--synthetic, deterministic pages and a feed with the same structure
+(ticker elements by ID, market tables, .market-table-row blocks, feed
+"current" entries by symbol) are generated instead, so the suite also
+runs without network access. fixtures/manifest.json records where each
+fixture came from.
+
+    python -m benchmarks.record_fixtures
+    python -m benchmarks.record_fixtures --synthetic
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timezone
+
+import feed_extractor
+import http_extractor
+from instruments import INSTRUMENTS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LIVE_BASE_URL = "https://www.tgju.org"
+LIVE_FEED_URL = "https://call1.tgju.org/ajax.json"
+PAGES = ("currency", "gold-chart", "coin")
+FEED_FIXTURE = "ajax.json"
+MANIFEST = "manifest.json"
+
+# Rial prices of the synthetic pages (cents for the ounce)
+SYNTHETIC_PRICES = {
+    "dollar": 1_040_500,
+    "euro": 1_135_200,
+    "pound": 1_320_800,
+    "dirham": 283_300,
+    "18k_gold": 68_950_000,
+    "ounce": 401_235,
+    "emami_coin": 815_000_000,
+    "half_coin": 450_000_000,
+    "quarter_coin": 265_000_000,
+}
+# Filler rows per table, roughly the size of the real market tables
+FILLER_ROWS = 120
+
+
+def fixture_path(page):
+    return os.path.join(FIXTURES_DIR, f"{page}.html")
+
+
+def fixture_sources():
+    """
+    Manifest entries by fixture file name, e.g. {"source": "live", "url": ...}
+    """
+    path = os.path.join(FIXTURES_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _record_source(fixture, **source):
+    sources = fixture_sources()
+    sources[fixture] = source
+    with open(os.path.join(FIXTURES_DIR, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(sources, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _live_source(url):
+    return {"source": "live", "url": url, "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+
+def record_live(base_url=LIVE_BASE_URL):
+    session = http_extractor.get_session()
+    for page in PAGES:
+        url = f"{base_url}/{page}"
+        response = session.get(url, timeout=http_extractor.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        with open(fixture_path(page), "wb") as f:
+            f.write(response.content)
+        _record_source(f"{page}.html", **_live_source(url))
+        print(f"recorded {url} ({len(response.content):,} bytes)")
+
+
+def record_live_feed(url=LIVE_FEED_URL):
+    response = http_extractor.get_session().get(url, timeout=http_extractor.REQUEST_TIMEOUT)
+    response.raise_for_status()
+    # Fail before overwriting the fixture if the feed is not JSON
+    response.json()
+    with open(os.path.join(FIXTURES_DIR, FEED_FIXTURE), "wb") as f:
+        f.write(response.content)
+    _record_source(FEED_FIXTURE, **_live_source(url))
+    print(f"recorded {url} ({len(response.content):,} bytes)")
+
+
+def _price_text(instrument, value):
+    if instrument.unit == "usd":
+        return f"{value // 100:,}.{value % 100:02d}"
+    return f"{value:,}"
+
+
+def synthetic_page(page, seed=1):
+    rng = random.Random(f"{seed}-{page}")
+    instruments = [instrument for instrument in INSTRUMENTS if instrument.url.endswith(f"/{page}")]
+    ticker = "\n".join(
+        f'<li id="{instrument.element_id}"><span class="info-title">{instrument.display_name}</span>'
+        f'<span class="info-price">{_price_text(instrument, SYNTHETIC_PRICES[instrument.key])}</span>'
+        f'<span class="info-change">({rng.uniform(-2, 2):.2f}%)</span></li>'
+        for instrument in instruments
+    )
+    rows = []
+    for instrument in instruments:
+        rows.append(
+            f'<tr><td>{instrument.name_patterns[-1]}</td>'
+            f'<td>{_price_text(instrument, SYNTHETIC_PRICES[instrument.key])}</td>'
+            f'<td>({rng.uniform(-2, 2):.2f}%)</td><td>{rng.randint(10, 23)}:{rng.randint(10, 59)}</td></tr>'
+        )
+    for index in range(FILLER_ROWS):
+        rows.append(
+            f'<tr><td>نماد {index}</td><td>{rng.randint(10_000, 90_000_000):,}</td>'
+            f'<td>({rng.uniform(-2, 2):.2f}%)</td><td>{rng.randint(10, 23)}:{rng.randint(10, 59)}</td></tr>'
+        )
+    market_rows = "\n".join(
+        f'<div class="market-table-row"><span class="market-name">نماد {index}</span>'
+        f'<span class="market-price">{rng.randint(10_000, 90_000_000):,}</span></div>'
+        for index in range(FILLER_ROWS // 2)
+    )
+    navigation = "\n".join(f'<li><a href="/profile/item-{index}">آیتم {index}</a></li>' for index in range(300))
+    return f"""<!DOCTYPE html>
+<html lang="fa" dir="rtl">
+<head><meta charset="utf-8"><title>{page} - synthetic tgju fixture</title></head>
+<body>
+<nav><ul>{navigation}</ul></nav>
+<ul class="info-bar">
+{ticker}
+</ul>
+<table class="market-table">
+<thead><tr><th>عنوان</th><th>قیمت</th><th>تغییر</th><th>زمان</th></tr></thead>
+<tbody>
+{"".join(rows)}
+</tbody>
+</table>
+<div class="market-rows">
+{market_rows}
+</div>
+</body>
+</html>
+"""
+
+
+def _feed_entry(price_text, rng):
+    return {
+        "p": price_text,
+        "h": price_text,
+        "l": price_text,
+        "d": f"{rng.randint(0, 5000):,}",
+        "dp": round(rng.uniform(0, 2), 2),
+        "dt": rng.choice(("high", "low")),
+        "t": f"{rng.randint(10, 23)}:{rng.randint(10, 59)}:{rng.randint(10, 59)}",
+        "ts": "2024-05-01 12:30:11",
+    }
+
+
+def synthetic_feed(seed=1):
+    """
+    Feed payload with the tracked symbols and filler symbols, shaped like ajax.json
+    """
+    rng = random.Random(f"{seed}-feed")
+    current = {
+        feed_extractor.feed_symbol(instrument):
+            _feed_entry(_price_text(instrument, SYNTHETIC_PRICES[instrument.key]), rng)
+        for instrument in INSTRUMENTS
+    }
+    for index in range(FILLER_ROWS * 3):
+        current[f"symbol_{index}"] = _feed_entry(f"{rng.randint(10_000, 90_000_000):,}", rng)
+    return {"current": current, "last": [], "tolerance_high": [], "tolerance_low": []}
+
+
+def record_synthetic(seed=1):
+    for page in PAGES:
+        html = synthetic_page(page, seed)
+        with open(fixture_path(page), "w", encoding="utf-8") as f:
+            f.write(html)
+        _record_source(f"{page}.html", source="synthetic", seed=seed)
+        print(f"generated {fixture_path(page)} ({len(html.encode('utf-8')):,} bytes)")
+    path = os.path.join(FIXTURES_DIR, FEED_FIXTURE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(synthetic_feed(seed), f, ensure_ascii=False, separators=(",", ":"))
+    _record_source(FEED_FIXTURE, source="synthetic", seed=seed)
+    print(f"generated {path} ({os.path.getsize(path):,} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--synthetic", action="store_true", help="generate pages instead of downloading them")
+    parser.add_argument("--base-url", default=LIVE_BASE_URL)
+    parser.add_argument("--feed-url", default=LIVE_FEED_URL)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    if args.synthetic:
+        record_synthetic(args.seed)
+    else:
+        record_live(args.base_url)
+        record_live_feed(args.feed_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Cycle time of threaded and sharded (multi-process) scraping as pages are added.
+
+Serves the recorded fixtures under many page URLs, each holding copies of
+the tracked instruments, and runs get_all_prices() over 1..N pages with
+the in-process thread pool and with a ScrapeCoordinator of W workers.
+With --kill, one worker is killed during a sharded cycle to show its
+pages being reassigned.
+
+    python -m benchmarks.sharded_scrape --pages 6,12,24 --workers 4
+    python -m benchmarks.sharded_scrape --pages 12 --workers 3 --kill
+"""
+import argparse
+import dataclasses
+import logging
+import os
+import statistics
+import threading
+import time
+
+
+def synthetic_instruments(base_url, pages):
+    """
+    Copies of the tracked instruments spread over ``pages`` distinct URLs
+    """
+    from instruments import get_instruments
+
+    instruments = []
+    templates = get_instruments()
+    for page in range(pages):
+        template_page = ("currency", "gold-chart", "coin")[page % 3]
+        for instrument in templates:
+            if not instrument.url.endswith(f"/{template_page}"):
+                continue
+            instruments.append(dataclasses.replace(
+                instrument,
+                key=f"{instrument.key}_{page}",
+                url=f"{base_url}/{template_page}?page={page}",
+            ))
+    return instruments
+
+
+def run_cycles(instruments, iterations, coordinator=None, kill_after=None):
+    import price_extractor_v2
+
+    latencies = []
+    found = 0
+    for index in range(iterations):
+        if kill_after is not None and index == iterations - 1:
+            victim = next(iter(coordinator._workers.values())).process
+            threading.Timer(kill_after, victim.kill).start()
+        started = time.perf_counter()
+        price_extractor_v2.get_all_prices(
+            instruments=instruments, engine="http", coordinator=coordinator, cycle_timeout=60
+        )
+        latencies.append(time.perf_counter() - started)
+        # The returned view is keyed by display name, so it folds the copies together
+        found = len(instruments) - len(price_extractor_v2.price_cache.failed_keys(instruments))
+    return latencies, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", default="3,6,12,24", help="comma separated page counts")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=3, help="pages each worker scrapes at once")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--page-latency", type=float, default=0.0, help="seconds added to every fixture response")
+    parser.add_argument("--kill", action="store_true", help="kill a worker during the last sharded cycle")
+    args = parser.parse_args()
+
+    from benchmarks.end_to_end import start_fixture_server
+    from scrape_workers import ScrapeCoordinator
+
+    server = start_fixture_server(args.page_latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["TGJU_BASE_URL"] = base_url
+    # Per-page INFO lines would dominate the run
+    logging.disable(logging.INFO)
+
+    coordinator = ScrapeCoordinator(
+        args.workers, threads=args.threads, heartbeat_interval=0.5, heartbeat_timeout=5
+    ).start()
+    rows = []
+    try:
+        # Let the workers import the scraper before timing them
+        coordinator.submit_page(f"{base_url}/currency", []).result(timeout=60)
+        for pages in (int(count) for count in args.pages.split(",")):
+            instruments = synthetic_instruments(base_url, pages)
+            threaded, threaded_found = run_cycles(instruments, args.iterations)
+            sharded, sharded_found = run_cycles(
+                instruments, args.iterations, coordinator, kill_after=0.05 if args.kill else None
+            )
+            rows.append((pages, len(instruments), statistics.median(threaded), threaded_found,
+                         statistics.median(sharded), max(sharded), sharded_found))
+    finally:
+        stats = coordinator.stats()
+        coordinator.stop()
+        server.shutdown()
+
+    print(f"{'pages':>6}{'instr':>7}{'threads s':>11}{'found':>7}"
+          f"{f'{args.workers} workers s':>14}{'max s':>8}{'found':>7}")
+    for pages, count, threaded, threaded_found, sharded, sharded_max, sharded_found in rows:
+        print(f"{pages:>6}{count:>7}{threaded:>11.2f}{threaded_found:>7}"
+              f"{sharded:>14.2f}{sharded_max:>8.2f}{sharded_found:>7}")
+    print(f"coordinator: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Ingest and query benchmark for the price history store.
+
+Writes a year of minute samples for one instrument into a temporary
+directory, then measures range queries and OHLC downsampling.
+
+    python -m benchmarks.timeseries --days 365
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from timeseries import TimeSeriesStore
+
+MINUTE = 60
+DAY = 24 * 60 * MINUTE
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def timed(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1000, max(latencies) * 1000
+
+
+def run(days, repeat, seed=1):
+    rng = random.Random(seed)
+    start = 1_700_000_000 - 1_700_000_000 % DAY
+    samples = days * DAY // MINUTE
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = TimeSeriesStore(directory)
+        price = 600_000
+        started = time.perf_counter()
+        for i in range(samples):
+            price += rng.randint(-50, 50)
+            store.append("dollar", start + i * MINUTE, price)
+        store.flush()
+        elapsed = time.perf_counter() - started
+        results["ingest_samples"] = samples
+        results["ingest_per_second"] = samples / elapsed
+        results["bytes_on_disk"] = directory_size(directory)
+        results["bytes_per_sample"] = results["bytes_on_disk"] / samples
+
+        end = start + samples * MINUTE
+        store.close()
+        started = time.perf_counter()
+        store = TimeSeriesStore(directory)
+        store.series("dollar")
+        results["reload_ms"] = (time.perf_counter() - started) * 1000
+
+        def random_range(length):
+            lo = rng.randrange(start, max(start + 1, end - length))
+            return lo, lo + length
+
+        queries = {
+            "range_1d": lambda: store.range("dollar", *random_range(DAY)),
+            "range_30d": lambda: store.range("dollar", *random_range(30 * DAY)),
+            "ohlc_1h_over_30d": lambda: store.ohlc("dollar", *random_range(30 * DAY), "1h"),
+            "ohlc_1d_over_all": lambda: store.ohlc("dollar", start, end, "1d"),
+        }
+        for name, query in queries.items():
+            results[name] = timed(query, repeat)
+        store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = run(args.days, args.repeat)
+    print(f"ingested {results['ingest_samples']:,} samples at {results['ingest_per_second']:,.0f}/s")
+    print(f"on disk: {results['bytes_on_disk']:,} bytes ({results['bytes_per_sample']:.1f} bytes/sample)")
+    print(f"reload: {results['reload_ms']:.1f} ms")
+    for name in ("range_1d", "range_30d", "ohlc_1h_over_30d", "ohlc_1d_over_all"):
+        p50, worst = results[name]
+        print(f"{name:<20} p50 {p50:8.2f} ms   max {worst:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledDriver:
+    """
+    A webdriver together with its bookkeeping inside the pool
+    """
+    __slots__ = ("driver", "pages", "created_at")
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.monotonic()
+
+
+class DriverPool:
+    """
+    Long-lived pool of warm Selenium drivers.
+
+    Drivers are launched lazily through ``factory`` (up to ``size`` at once),
+    health-checked before each reuse and recycled after ``max_pages`` pages
+    or whenever a caller reports a crash.
+    """
+
+    def __init__(self, factory, size=3, max_pages=50):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.max_pages = max(1, int(max_pages))
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "launches": 0,
+            "launch_seconds": 0.0,
+            "reuses": 0,
+            "recycled": 0,
+            "crashed": 0,
+            "unhealthy": 0,
+        }
+
+    def _launch(self):
+        started = time.monotonic()
+        driver = self.factory()
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._stats["launches"] += 1
+            self._stats["launch_seconds"] += elapsed
+        logger.info(f"Driver launched in {elapsed:.2f}s")
+        return _PooledDriver(driver)
+
+    @staticmethod
+    def _is_healthy(pooled):
+        try:
+            # Any cheap command proves the browser and chromedriver are alive
+            pooled.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing pooled driver: {str(e)}")
+
+    def acquire(self, timeout=None):
+        """
+        Take a driver from the pool, launching a new one if there is room
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                pooled = self._idle.pop() if self._idle else None
+                launch = pooled is None and self._created < self.size
+                if launch:
+                    self._created += 1
+                elif pooled is None:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a pooled driver")
+                    self._cond.wait(remaining)
+                    continue
+
+            if launch:
+                try:
+                    return self._launch()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_healthy(pooled):
+                with self._cond:
+                    self._stats["reuses"] += 1
+                return pooled
+
+            logger.warning("Pooled driver failed health check, replacing it")
+            self._quit(pooled)
+            with self._cond:
+                self._stats["unhealthy"] += 1
+                self._created -= 1
+
+    def release(self, pooled, broken=False):
+        """
+        Return a driver to the pool, recycling it if it crashed or is worn out
+        """
+        pooled.pages += 1
+        recycle = broken or pooled.pages >= self.max_pages
+        with self._cond:
+            if broken:
+                self._stats["crashed"] += 1
+            elif recycle:
+                self._stats["recycled"] += 1
+            if recycle or self._closed:
+                self._created -= 1
+            else:
+                self._idle.append(pooled)
+            self._cond.notify()
+        if recycle or self._closed:
+            logger.info(f"Recycling driver after {pooled.pages} pages (broken={broken})")
+            self._quit(pooled)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """
+        Borrow a driver for the duration of a ``with`` block
+        """
+        pooled = self.acquire(timeout=timeout)
+        try:
+            yield pooled.driver
+        except Exception:
+            self.release(pooled, broken=True)
+            raise
+        else:
+            self.release(pooled)
+
+    def close(self):
+        """
+        Quit every idle driver and refuse further acquisitions
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def stats(self):
+        """
+        Launch/reuse counters and the launch time saved by reusing drivers
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["live"] = self._created
+            stats["idle"] = len(self._idle)
+        launches = stats["launches"]
+        avg_launch = stats["launch_seconds"] / launches if launches else 0.0
+        stats["avg_launch_seconds"] = round(avg_launch, 3)
+        stats["saved_seconds"] = round(avg_launch * stats["reuses"], 3)
+        stats["launch_seconds"] = round(stats["launch_seconds"], 3)
+        return stats
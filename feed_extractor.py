@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+import time
+
+from http_extractor import REQUEST_TIMEOUT, get_session
+from metrics import ERRORS, EXTRACTION_SECONDS, PAGE_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Live-data feed the tgju pages poll in the background; TGJU_FEED_URL points
+# it at a mirror or a local fixture server (see benchmarks/)
+FEED_URL = os.getenv("TGJU_FEED_URL", "https://call1.tgju.org/ajax.json")
+
+# Seconds a downloaded feed is reused, so the pages of one cycle share a
+# single request
+FEED_MAX_AGE = 5.0
+
+# Ticker element IDs on the pages are "l-" + the feed symbol
+ELEMENT_ID_PREFIX = "l-"
+
+
+class FeedSchemaError(ValueError):
+    """
+    The feed no longer has the expected {"current": {symbol: {"p": ...}}} shape
+    """
+
+
+def feed_symbol(instrument):
+    """
+    Feed symbol of an instrument, derived from its ticker element ID
+    """
+    element_id = instrument.element_id
+    if element_id.startswith(ELEMENT_ID_PREFIX):
+        return element_id[len(ELEMENT_ID_PREFIX):]
+    return element_id
+
+
+_cache_lock = threading.Lock()
+# (fetched_at, payload or None, error or None)
+_cached = None
+
+
+def fetch_feed(url=None, timeout=REQUEST_TIMEOUT):
+    """
+    Download and decode the feed over the shared keep-alive session
+    """
+    url = url or FEED_URL
+    started = time.monotonic()
+    response = get_session().get(url, timeout=timeout, headers={"Accept": "application/json"})
+    response.raise_for_status()
+    payload = response.json()
+    PAGE_LOAD_SECONDS.observe(time.monotonic() - started, engine="feed", url=url)
+    logger.info(f"Fetched {url} in {time.monotonic() - started:.2f}s ({len(response.content)} bytes)")
+    return payload
+
+
+def get_feed(max_age=FEED_MAX_AGE):
+    """
+    Feed payload, downloaded at most once per ``max_age`` seconds.
+
+    Concurrent callers wait for the download in flight instead of starting
+    their own; a failed download is reported to them all.
+    """
+    global _cached
+    with _cache_lock:
+        now = time.monotonic()
+        if _cached is None or now - _cached[0] >= max_age:
+            try:
+                _cached = (now, fetch_feed(), None)
+            except Exception as e:
+                _cached = (now, None, e)
+        _, payload, error = _cached
+    if error is not None:
+        raise error
+    return payload
+
+
+def clear_cache():
+    """
+    Forget the cached feed, so the next call downloads it again
+    """
+    global _cached
+    with _cache_lock:
+        _cached = None
+
+
+def decode_prices(payload, symbols):
+    """
+    Price texts of ``symbols`` (name -> feed symbol) from a decoded feed.
+    Returns ``(found, missing)``; raises FeedSchemaError if the payload is
+    not shaped like the tgju feed at all.
+    """
+    current = payload.get("current") if isinstance(payload, dict) else None
+    if not isinstance(current, dict):
+        raise FeedSchemaError("feed has no 'current' object")
+    found = {}
+    missing = []
+    for name, symbol in symbols.items():
+        entry = current.get(symbol)
+        price_text = entry.get("p") if isinstance(entry, dict) else None
+        if price_text in (None, ""):
+            missing.append(name)
+        else:
+            found[name] = str(price_text)
+    return found, missing
+
+
+def get_prices(instruments, max_age=FEED_MAX_AGE):
+    """
+    Raw price texts of ``instruments`` keyed by instrument key from the feed.
+    Returns ``(found, missing_keys)``; everything is missing when the feed
+    is unreachable or its schema changed.
+    """
+    symbols = {instrument.key: feed_symbol(instrument) for instrument in instruments}
+    try:
+        payload = get_feed(max_age)
+        with EXTRACTION_SECONDS.time(engine="feed", mode="json"):
+            return decode_prices(payload, symbols)
+    except FeedSchemaError as e:
+        ERRORS.inc(component="feed_schema")
+        logger.error(f"Unexpected feed schema from {FEED_URL}: {e}")
+    except Exception as e:
+        ERRORS.inc(component="feed_fetch")
+        logger.warning(f"Feed fetch failed for {FEED_URL}: {str(e)}")
+    return {}, list(symbols)
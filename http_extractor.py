@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from metrics import ERRORS, EXTRACTION_SECONDS, PAGE_LOAD_SECONDS
+from price_parsing import resolve_prices
+
+logger = logging.getLogger(__name__)
+
+# Prefer lxml when it is installed, it is several times faster than html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+REQUEST_TIMEOUT = 15
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/122.0 Safari/537.36"
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Shared keep-alive session so every cycle reuses the same TCP/TLS connections
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=1)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept-Language": "fa,en;q=0.8",
+            })
+            _session = session
+        return _session
+
+
+def fetch_page(url, timeout=REQUEST_TIMEOUT):
+    """
+    Download a page and parse it
+    """
+    started = time.monotonic()
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.content, HTML_PARSER)
+    # Download plus HTML parse, the counterpart of a browser page load
+    PAGE_LOAD_SECONDS.observe(time.monotonic() - started, engine="http", url=url)
+    logger.info(
+        f"Fetched {url} over HTTP in {time.monotonic() - started:.2f}s "
+        f"({len(response.content)} bytes)"
+    )
+    return soup
+
+
+def snapshot_page(soup, element_ids):
+    """
+    Reduce a parsed page to the compact snapshot structure used by resolve_prices
+    """
+    snapshot = {"ids": {}, "tables": [], "market_rows": []}
+    for element_id in element_ids:
+        element = soup.find(id=element_id)
+        if element is not None:
+            snapshot["ids"][element_id] = element.get_text(" ", strip=True)
+    for row in soup.select("table.market-table tr"):
+        cells = row.find_all("td")
+        if len(cells) >= 2:
+            snapshot["tables"].append([
+                cells[0].get_text(" ", strip=True),
+                cells[1].get_text(" ", strip=True),
+            ])
+    for row in soup.select(".market-table-row"):
+        name_element = row.select_one(".market-name")
+        price_element = row.select_one(".market-price")
+        if name_element is not None and price_element is not None:
+            snapshot["market_rows"].append([
+                name_element.get_text(" ", strip=True),
+                price_element.get_text(" ", strip=True),
+            ])
+    return snapshot
+
+
+def extract_prices(soup, targets):
+    """
+    Extract ``targets`` (name -> (element_id, name_patterns)) from a parsed page.
+    Returns ``(found, missing)``.
+    """
+    element_ids = [element_id for element_id, _ in targets.values()]
+    with EXTRACTION_SECONDS.time(engine="http", mode="soup"):
+        return resolve_prices(snapshot_page(soup, element_ids), targets)
+
+
+def get_page_prices(url, targets):
+    """
+    Fetch ``url`` over plain HTTP and extract ``targets`` from it
+    """
+    try:
+        soup = fetch_page(url)
+    except Exception as e:
+        ERRORS.inc(component="http_fetch")
+        logger.warning(f"HTTP fetch failed for {url}: {str(e)}")
+        return {}, list(targets)
+    return extract_prices(soup, targets)
@@ -0,0 +1,116 @@
+import os
+from dataclasses import dataclass
+
+# URL addresses; TGJU_BASE_URL points the scraper at a mirror or a local
+# fixture server (see benchmarks/)
+BASE_URL = os.getenv("TGJU_BASE_URL", "https://www.tgju.org").rstrip("/")
+CURRENCY_URL = f"{BASE_URL}/currency"
+GOLD_URL = f"{BASE_URL}/gold-chart"
+COIN_URL = f"{BASE_URL}/coin"
+
+# Message sections, in the order they are rendered
+CATEGORIES = ("currencies", "gold", "coin")
+
+
+@dataclass(frozen=True)
+class Instrument:
+    """
+    One tgju symbol and where to find it
+    """
+    key: str
+    url: str
+    element_id: str
+    name_patterns: tuple
+    category: str
+    display_name: str
+    # Unit of the value published on tgju ("rial" prices are shown in tomans)
+    unit: str = "rial"
+    # Sane (min, max) of the parsed value, in rials or cents for "usd";
+    # anything outside is treated as a failed scrape
+    valid_range: tuple = (1, None)
+
+
+INSTRUMENTS = (
+    Instrument(
+        "dollar", CURRENCY_URL, "l-price_dollar_rl", ("دلار",), "currencies", "دلار",
+        valid_range=(100_000, 50_000_000),
+    ),
+    Instrument(
+        "euro", CURRENCY_URL, "l-price_eur", ("یورو",), "currencies", "یورو",
+        valid_range=(100_000, 60_000_000),
+    ),
+    Instrument(
+        "pound", CURRENCY_URL, "l-price_gbp", ("پوند",), "currencies", "پوند",
+        valid_range=(100_000, 70_000_000),
+    ),
+    Instrument(
+        "dirham", CURRENCY_URL, "l-price_aed", ("درهم",), "currencies", "درهم",
+        valid_range=(20_000, 15_000_000),
+    ),
+    Instrument(
+        "18k_gold", GOLD_URL, "l-geram18",
+        ("طلای 18 عیار", "یک گرم طلای 18 عیار"), "gold", "طلای 18 عیار",
+        valid_range=(5_000_000, 5_000_000_000),
+    ),
+    Instrument(
+        "ounce", GOLD_URL, "l-ons", ("انس طلا",), "gold", "انس طلا", unit="usd",
+        valid_range=(50_000, 2_000_000),
+    ),
+    Instrument(
+        "emami_coin", COIN_URL, "l-sekee",
+        ("سکه امامی", "سکه طرح امامی"), "coin", "سکه امامی",
+        valid_range=(50_000_000, 50_000_000_000),
+    ),
+    Instrument(
+        "half_coin", COIN_URL, "l-nim", ("نیم سکه",), "coin", "نیم سکه",
+        valid_range=(25_000_000, 25_000_000_000),
+    ),
+    Instrument(
+        "quarter_coin", COIN_URL, "l-rob", ("ربع سکه",), "coin", "ربع سکه",
+        valid_range=(10_000_000, 15_000_000_000),
+    ),
+)
+
+INSTRUMENTS_BY_KEY = {instrument.key: instrument for instrument in INSTRUMENTS}
+
+# Instruments published when TRACKED_INSTRUMENTS is not set
+DEFAULT_TRACKED = ("dollar", "euro", "18k_gold", "emami_coin")
+
+
+def get_instruments(keys=None):
+    """
+    Tracked instruments in registry order.
+
+    ``keys`` (or the comma separated TRACKED_INSTRUMENTS variable, where
+    ``all`` selects the whole registry) restricts the set.
+    """
+    if keys is None:
+        tracked = os.getenv("TRACKED_INSTRUMENTS", "").strip()
+        if tracked == "all":
+            return INSTRUMENTS
+        keys = [key.strip() for key in tracked.split(",") if key.strip()] or DEFAULT_TRACKED
+    unknown = [key for key in keys if key not in INSTRUMENTS_BY_KEY]
+    if unknown:
+        raise ValueError(f"Unknown instruments: {unknown}")
+    keys = set(keys)
+    return tuple(instrument for instrument in INSTRUMENTS if instrument.key in keys)
+
+
+def group_by_page(instruments):
+    """
+    Map each URL to the instruments read from it, so every page is fetched once
+    """
+    pages = {}
+    for instrument in instruments:
+        pages.setdefault(instrument.url, []).append(instrument)
+    return pages
+
+
+def page_targets(instruments):
+    """
+    Lookup targets for price_parsing.resolve_prices: key -> (element_id, name_patterns)
+    """
+    return {
+        instrument.key: (instrument.element_id, instrument.name_patterns)
+        for instrument in instruments
+    }
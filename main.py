@@ -1,20 +1,32 @@
 import os
 import asyncio
 from datetime import datetime, time, timedelta
-import pytz
 from dotenv import load_dotenv
 from telegram import Bot
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, TelegramError
+from telegram.request import HTTPXRequest
 import logging
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from price_extractor_v2 import get_all_prices
+from price_extractor_v2 import get_all_prices, get_cached_prices, get_failed_instruments, price_cache
+from pipeline import StreamingPipeline
+from scrape_workers import ScrapeCoordinator
+from quotes import QuoteCache, build_application, serve_commands
+from alerts import AlertEngine, add_alert_handlers, deliver as deliver_alerts
+from metrics import ERRORS, FORMAT_SECONDS, start_http_server
+from scheduler import last_daily_run, run_at_fixed_rate, run_daily
+from state_store import DEFAULT_STATE_FILE, StateStore
+from timeseries import DEFAULT_HISTORY_DIR, TimeSeriesStore
+from telegram_queue import SendQueue
 from message_manager import (
     format_price_message,
-    save_latest_message_id,
-    get_latest_message_id_from_file,
-    is_send_time,
-    get_iran_time_now
+    price_snapshot,
+    get_iran_time_now,
+    IRAN_TZ
 )
 
 # تنظیمات لاگ
@@ -27,7 +39,17 @@ logger = logging.getLogger(__name__)
 # بارگذاری متغیرهای محیطی
 load_dotenv(override=True)
 BOT_TOKEN = os.getenv('BOT_TOKEN')
-CHANNEL_ID = "@testdigitallvpn"
+# کانال‌های مقصد (با کاما جدا می‌شوند)
+CHANNEL_IDS = [
+    channel.strip()
+    for channel in os.getenv('CHANNEL_IDS', os.getenv('CHANNEL_ID', "@testdigitallvpn")).split(',')
+    if channel.strip()
+]
+CHANNEL_ID = CHANNEL_IDS[0]
+# حداکثر تعداد کانال‌هایی که همزمان به‌روزرسانی می‌شوند
+PUBLISH_CONCURRENCY = int(os.getenv('PUBLISH_CONCURRENCY', 10))
+# batch: انتشار پس از استخراج همه صفحه‌ها؛ stream: انتشار هر صفحه به محض آماده شدن
+PUBLISH_MODE = os.getenv('PUBLISH_MODE', 'batch')
 PRICE_MESSAGE_KEYWORD = "قیمت‌های به‌روز شده"
 
 # زمان‌های ارسال پیام جدید (به جای ویرایش)
@@ -36,254 +58,514 @@ SEND_TIMES = [
     time(19, 0)  # 9:50 PM
 ]
 
-# فایل ذخیره شناسه پیام‌های مربوط به قیمت
-PRICE_MESSAGES_FILE = "price_messages.json"
-# فایل ذخیره آخرین شناسه پیام
-LAST_MESSAGE_ID_FILE = "last_message_id.txt"
-# فایل ذخیره آخرین زمان ارسال پیام جدید
-LAST_SEND_TIME_FILE = "last_send_time.txt"
+# حداکثر فاصله (ثانیه) بین دو ویرایش وقتی قیمت‌ها تغییری نکرده‌اند
+STALE_HEARTBEAT_SECONDS = int(os.getenv('STALE_HEARTBEAT_SECONDS', 600))
+
+# فاصله (ثانیه) بین دو به‌روزرسانی
+UPDATE_INTERVAL_SECONDS = float(os.getenv('UPDATE_INTERVAL_SECONDS', 60))
+# جلوگیری از اجرای همزمان به‌روزرسانی دقیقه‌ای و ارسال زمان‌بندی شده
+update_lock = asyncio.Lock()
+
+# حداکثر زمان (ثانیه) یک دور استخراج قیمت
+SCRAPE_DEADLINE_SECONDS = float(os.getenv('SCRAPE_DEADLINE_SECONDS', 45))
+
+# پورت endpoint متریک‌ها با فرمت Prometheus (صفر یعنی غیرفعال)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# استخراج در یک thread جداگانه اجرا می‌شود تا event loop مسدود نشود؛
+# یک worker باعث می‌شود دورهای استخراج روی هم انباشته نشوند
+SCRAPE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scraper")
+
+# threads: همه صفحه‌ها در همین پردازه؛ sharded: تقسیم صفحه‌ها بین SCRAPE_WORKERS
+# پردازه جداگانه با heartbeat و واگذاری دوباره صفحه‌های پردازه‌ای که از کار افتاده
+SCRAPE_MODE = os.getenv('SCRAPE_MODE', 'threads')
+SCRAPE_WORKERS = int(os.getenv('SCRAPE_WORKERS', 2))
+scrape_coordinator = None
+
+# تأخیر اولیه (ثانیه) برای استخراج دوباره نمادهایی که استخراجشان ناموفق بود؛
+# هر تلاش ناموفق تأخیر را دو برابر می‌کند تا به فاصله به‌روزرسانی برسد
+RETRY_BACKOFF_SECONDS = float(os.getenv('RETRY_BACKOFF_SECONDS', 10))
+retry_task = None
+
+# حداکثر تعداد پیام در هر درخواست deleteMessages
+DELETE_BATCH_SIZE = 100
+
+# کارهای پس‌زمینه (مثل حذف پیام‌های قدیمی) تا پایان اجرا نگه داشته می‌شوند
+background_tasks = set()
+
+# محدودیت‌های ارسال به API تلگرام
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE_PER_MINUTE = float(os.getenv('TELEGRAM_CHAT_RATE_PER_MINUTE', 20))
+# حداکثر درخواست همزمان به API؛ اندازه connection pool هم همین است
+# (pool پیش‌فرض کتابخانه فقط یک اتصال دارد)
+TELEGRAM_MAX_IN_FLIGHT = int(os.getenv('TELEGRAM_MAX_IN_FLIGHT', 20))
+# آدرس API تلگرام، مثلاً برای سرور آزمایشی محلی (benchmarks/fake_bot_api.py)
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')
+# پاسخ به دستور /price و inline query از آخرین قیمت‌های موجود در حافظه
+BOT_COMMANDS = os.getenv('BOT_COMMANDS', '1') != '0'
+
+# آخرین قیمت‌های منتشر شده و زمان انتشار آن‌ها (monotonic) برای هر کانال
+last_published = {}
+
+# وضعیت ربات (شناسه پیام‌ها و زمان ارسال هر کانال) در حافظه نگهداری
+# و با تأخیر کوتاه به صورت اتمیک روی دیسک نوشته می‌شود
+STATE_FILE = os.getenv('STATE_FILE', DEFAULT_STATE_FILE)
+state = StateStore(STATE_FILE, flush_interval=float(os.getenv('STATE_FLUSH_SECONDS', 5)))
+
+# تاریخچه قیمت‌ها (برای نمودار و هشدار)
+history = TimeSeriesStore(os.getenv('HISTORY_DIR', DEFAULT_HISTORY_DIR))
 
-def save_price_message_id(message_id):
-    """ذخیره شناسه پیام قیمت در فایل"""
+# هشدارهای قیمت کاربران (در بخش alerts فایل وضعیت نگهداری می‌شوند)
+alert_engine = AlertEngine(state, max_per_chat=int(os.getenv('MAX_ALERTS_PER_CHAT', 20)))
+
+# فایل‌های وضعیت قدیمی که در اولین اجرا به STATE_FILE منتقل می‌شوند
+LEGACY_CHANNEL_STATE_DIR = "channel_state"
+LEGACY_PRICE_MESSAGES_FILE = "price_messages.json"
+LEGACY_LAST_MESSAGE_ID_FILE = "last_message_id.txt"
+LEGACY_LAST_SEND_TIME_FILE = "last_send_time.txt"
+
+def _read_legacy_file(path):
     try:
-        # خواندن شناسه‌های قبلی
-        message_ids = []
-        if os.path.exists(PRICE_MESSAGES_FILE):
-            with open(PRICE_MESSAGES_FILE, 'r') as f:
-                message_ids = json.load(f)
-        
-        # اضافه کردن شناسه جدید
-        if message_id not in message_ids:
-            message_ids.append(message_id)
-        
-        # ذخیره در فایل
-        with open(PRICE_MESSAGES_FILE, 'w') as f:
-            json.dump(message_ids, f)
-            
-        logger.info(f"شناسه پیام {message_id} ذخیره شد")
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return f.read().strip() or None
     except Exception as e:
-        logger.error(f"خطا در ذخیره شناسه پیام: {e}")
+        logger.error(f"خطا در خواندن فایل قدیمی {path}: {e}")
+    return None
 
-def get_saved_price_message_ids():
+def migrate_legacy_state():
+    """انتقال وضعیت ذخیره شده در فایل‌های قدیمی به state"""
+    for index, channel_id in enumerate(CHANNEL_IDS):
+        directory = os.path.join(LEGACY_CHANNEL_STATE_DIR, re.sub(r'[^\w@-]', '_', str(channel_id)))
+        if not os.path.isdir(directory):
+            if index:
+                continue
+            # نسخه تک‌کاناله فایل‌ها را در پوشه اصلی نگه می‌داشت
+            directory = "."
+        message_ids = _read_legacy_file(os.path.join(directory, LEGACY_PRICE_MESSAGES_FILE))
+        last_message_id = _read_legacy_file(os.path.join(directory, LEGACY_LAST_MESSAGE_ID_FILE))
+        last_send_time = _read_legacy_file(os.path.join(directory, LEGACY_LAST_SEND_TIME_FILE))
+        if not (message_ids or last_message_id or last_send_time):
+            continue
+        channel = state.channel(channel_id)
+        try:
+            channel["price_message_ids"] = json.loads(message_ids) if message_ids else []
+            channel["last_message_id"] = int(last_message_id) if last_message_id else None
+            if last_send_time:
+                dt = datetime.strptime(last_send_time, "%Y-%m-%d %H:%M:%S")
+                channel["last_send_time"] = IRAN_TZ.localize(dt).isoformat()
+        except Exception as e:
+            logger.error(f"خطا در انتقال وضعیت قدیمی {channel_id}: {e}")
+        logger.info(f"وضعیت قدیمی {channel_id} از {directory} منتقل شد")
+        state.mark_dirty()
+
+def load_state():
+    """بارگذاری یک‌باره وضعیت در شروع برنامه"""
+    if not state.load():
+        migrate_legacy_state()
+        state.flush()
+    alert_engine.load()
+
+def save_price_message_id(channel_id, message_id):
+    """ذخیره شناسه پیام قیمت"""
+    message_ids = state.channel(channel_id)["price_message_ids"]
+    if message_id not in message_ids:
+        message_ids.append(message_id)
+        state.mark_dirty()
+    logger.info(f"شناسه پیام {message_id} برای {channel_id} ذخیره شد")
+
+def remove_price_message_ids(channel_id, removed_ids):
+    """حذف شناسه‌های داده شده از فهرست پیام‌های قیمت ذخیره شده"""
+    removed_ids = set(removed_ids)
+    channel = state.channel(channel_id)
+    channel["price_message_ids"] = [
+        message_id for message_id in channel["price_message_ids"]
+        if message_id not in removed_ids
+    ]
+    state.mark_dirty()
+
+def get_saved_price_message_ids(channel_id):
     """دریافت شناسه‌های پیام‌های قیمت ذخیره شده"""
-    try:
-        if os.path.exists(PRICE_MESSAGES_FILE):
-            with open(PRICE_MESSAGES_FILE, 'r') as f:
-                return json.load(f)
-        return []
-    except Exception as e:
-        logger.error(f"خطا در خواندن شناسه‌های پیام: {e}")
-        return []
+    return list(state.channel(channel_id)["price_message_ids"])
 
-def save_last_message_id(message_id):
+def save_last_message_id(channel_id, message_id):
     """ذخیره آخرین شناسه پیام برای ویرایش"""
-    try:
-        with open(LAST_MESSAGE_ID_FILE, 'w') as f:
-            f.write(str(message_id))
-        # به message_manager اطلاع بدهیم
-        save_latest_message_id(message_id)
-        logger.info(f"آخرین شناسه پیام {message_id} ذخیره شد")
-    except Exception as e:
-        logger.error(f"خطا در ذخیره آخرین شناسه پیام: {e}")
+    state.channel(channel_id)["last_message_id"] = message_id
+    state.mark_dirty()
+    logger.info(f"آخرین شناسه پیام {message_id} برای {channel_id} ذخیره شد")
 
-def get_last_message_id():
+def get_last_message_id(channel_id):
     """دریافت آخرین شناسه پیام برای ویرایش"""
-    try:
-        if os.path.exists(LAST_MESSAGE_ID_FILE):
-            with open(LAST_MESSAGE_ID_FILE, 'r') as f:
-                message_id = f.read().strip()
-                return int(message_id) if message_id else None
-        return None
-    except Exception as e:
-        logger.error(f"خطا در خواندن آخرین شناسه پیام: {e}")
-        return None
+    return state.channel(channel_id)["last_message_id"]
 
-def save_last_send_time():
+def save_last_send_time(channel_id):
     """ذخیره آخرین زمان ارسال پیام جدید"""
-    try:
-        now = get_iran_time_now()
-        with open(LAST_SEND_TIME_FILE, 'w') as f:
-            f.write(now.strftime("%Y-%m-%d %H:%M:%S"))
-        logger.info(f"آخرین زمان ارسال پیام ذخیره شد: {now}")
-    except Exception as e:
-        logger.error(f"خطا در ذخیره آخرین زمان ارسال پیام: {e}")
+    now = get_iran_time_now()
+    state.channel(channel_id)["last_send_time"] = now.isoformat()
+    state.mark_dirty()
+    logger.info(f"آخرین زمان ارسال پیام ذخیره شد: {now}")
 
-def get_last_send_time():
+def get_last_send_time(channel_id):
     """دریافت آخرین زمان ارسال پیام جدید"""
+    value = state.channel(channel_id)["last_send_time"]
     try:
-        if os.path.exists(LAST_SEND_TIME_FILE):
-            with open(LAST_SEND_TIME_FILE, 'r') as f:
-                time_str = f.read().strip()
-                if time_str:
-                    # تبدیل به datetime با منطقه زمانی ایران (نه UTC)
-                    dt = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-                    return dt.replace(tzinfo=pytz.timezone('Asia/Tehran'))
-        return None
-    except Exception as e:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError as e:
         logger.error(f"خطا در خواندن آخرین زمان ارسال پیام: {e}")
         return None
 
-def should_send_new_message():
+def should_send_new_message(channel_id, force_new=False):
     """بررسی اینکه آیا باید پیام جدید ارسال شود یا پیام موجود ویرایش شود"""
-    now = get_iran_time_now()
-    logger.info(f"بررسی نیاز به ارسال پیام جدید - زمان فعلی: {now.strftime('%H:%M:%S')}")
-    
+    last_send_time = get_last_send_time(channel_id)
+    last_slot = last_daily_run(get_iran_time_now(), SEND_TIMES, IRAN_TZ)
+
+    # در زمان‌های ارسال، زمان‌بند پیام جدید را صریحاً درخواست می‌کند؛
+    # اگر دور قبلی (که پیش از این زمان شروع شده بود) پیام این زمان را
+    # به عنوان ارسال جاافتاده فرستاده باشد، پیام دوم ارسال نمی‌شود
+    if force_new:
+        if last_send_time is not None and last_send_time >= last_slot:
+            logger.info(
+                f"پیام ساعت {last_slot.strftime('%H:%M')} در {channel_id} قبلاً ارسال شده است"
+            )
+        else:
+            logger.info(f"زمان ارسال پیام جدید در {channel_id} فرا رسیده است")
+            return True
+
     # اگر آخرین پیامی وجود ندارد، پیام جدید ارسال شود
-    if get_last_message_id() is None:
+    if get_last_message_id(channel_id) is None:
         logger.info("هیچ پیام قبلی وجود ندارد، پیام جدید ارسال خواهد شد")
         return True
-    
-    # دریافت آخرین زمان ارسال پیام
-    last_send_time = get_last_send_time()
-    if last_send_time:
-        logger.info(f"آخرین زمان ارسال پیام: {last_send_time.strftime('%Y-%m-%d %H:%M:%S')}")
-    else:
-        logger.info("هیچ زمان ارسال قبلی ثبت نشده است")
-    
-    # بررسی زمان‌های مشخص شده برای ارسال پیام جدید
-    current_time = now.time()
-    for send_time in SEND_TIMES:
-        logger.info(f"بررسی زمان ارسال {send_time.hour}:{send_time.minute}")
-        
-        # اگر دقیقاً در زمان مشخص شده هستیم (با محدوده 1 دقیقه)
-        if (
-            send_time.hour == current_time.hour and
-            abs(send_time.minute - current_time.minute) <= 1
-        ):
-            logger.info(f"دقیقاً در زمان ارسال مشخص شده هستیم ({send_time.hour}:{send_time.minute})")
-            # در زمان دقیق مشخص شده، همیشه پیام جدید ارسال می‌کنیم
+
+    # اگر آخرین زمان ارسال پیش از آخرین زمان ارسال برنامه‌ریزی شده است
+    # (مثلاً ربات در آن زمان خاموش بوده)، ارسال جاافتاده انجام می‌شود
+    if last_send_time is not None:
+        if last_send_time < last_slot:
+            logger.info(
+                f"ارسال ساعت {last_slot.strftime('%H:%M')} در {channel_id} انجام نشده بود، "
+                "پیام جدید ارسال خواهد شد"
+            )
             return True
-            
-        # اگر در محدوده گسترده‌تر زمان ارسال هستیم (5 دقیقه)
-        elif (
-            send_time.hour == current_time.hour and
-            abs(send_time.minute - current_time.minute) <= 5
-        ):
-            logger.info(f"در محدوده زمان ارسال هستیم (±5 دقیقه از {send_time.hour}:{send_time.minute})")
-            
-            # اگر آخرین زمان ارسال ثبت نشده است
-            if last_send_time is None:
-                logger.info("هیچ زمان ارسال قبلی ثبت نشده است، پیام جدید ارسال خواهد شد")
-                return True
-                
-            # بررسی تفاوت زمانی
-            time_diff = now - last_send_time
-            logger.info(f"فاصله زمانی از آخرین ارسال: {time_diff.total_seconds()} ثانیه")
-            
-            # اگر امروز پیام ارسال نشده یا از آخرین ارسال بیش از 10 دقیقه گذشته
-            today = now.date()
-            last_send_date = last_send_time.date()
-            
-            if last_send_date < today or time_diff.total_seconds() > 600:
-                logger.info("پیام جدید ارسال خواهد شد (زمان کافی از آخرین ارسال گذشته است)")
-                return True
-            else:
-                logger.info("زمان کافی از آخرین ارسال نگذشته است، پیام ویرایش خواهد شد")
-            
-    logger.info("خارج از زمان‌های ارسال پیام جدید هستیم، پیام ویرایش خواهد شد")
+
     return False
 
-async def send_new_price_message(bot, prices):
+async def send_new_price_message(bot, channel_id, message):
     """ارسال پیام قیمت جدید"""
-    # حذف پیام‌های قبلی
-    await find_and_delete_old_price_messages(bot, CHANNEL_ID)
+    # پیام‌های قبلی بعد از ارسال پیام جدید و در پس‌زمینه حذف می‌شوند
+    old_message_ids = get_saved_price_message_ids(channel_id)
 
     # ارسال پیام جدید
-    message = format_price_message(prices)
     sent_message = await bot.send_message(
-        chat_id=CHANNEL_ID,
+        chat_id=channel_id,
         text=message,
         parse_mode=ParseMode.HTML
     )
     
     # ذخیره شناسه پیام جدید و زمان ارسال
     message_id = sent_message.message_id
-    save_price_message_id(message_id)
-    save_last_message_id(message_id)
-    save_last_send_time()
-    logger.info(f"پیام جدید قیمت با ID {message_id} ارسال شد")
+    save_price_message_id(channel_id, message_id)
+    save_last_message_id(channel_id, message_id)
+    save_last_send_time(channel_id)
+    logger.info(f"پیام جدید قیمت با ID {message_id} در {channel_id} ارسال شد")
+
+    old_message_ids = [msg_id for msg_id in old_message_ids if msg_id != message_id]
+    if old_message_ids:
+        task = asyncio.create_task(delete_old_price_messages(bot, channel_id, old_message_ids))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
     return True
 
-async def edit_price_message(bot, prices):
+async def edit_price_message(bot, channel_id, message):
     """ویرایش آخرین پیام قیمت"""
-    message_id = get_last_message_id()
+    message_id = get_last_message_id(channel_id)
     if message_id is None:
-        logger.warning("هیچ پیام قبلی برای ویرایش یافت نشد")
-        return await send_new_price_message(bot, prices)
+        logger.warning(f"هیچ پیام قبلی برای ویرایش در {channel_id} یافت نشد")
+        return await send_new_price_message(bot, channel_id, message)
         
     try:
         # ویرایش پیام موجود
-        message = format_price_message(prices)
         await bot.edit_message_text(
-            chat_id=CHANNEL_ID,
+            chat_id=channel_id,
             message_id=message_id,
             text=message,
             parse_mode=ParseMode.HTML
         )
-        logger.info(f"پیام قیمت با ID {message_id} ویرایش شد")
+        logger.info(f"پیام قیمت با ID {message_id} در {channel_id} ویرایش شد")
         return True
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            logger.info(f"پیام {message_id} در {channel_id} تغییری نداشت")
+            return True
+        logger.error(f"خطا در ویرایش پیام {message_id} در {channel_id}: {e}")
+        # فقط اگر پیام قابل ویرایش نیست، پیام جدید ارسال می‌کنیم
+        return await send_new_price_message(bot, channel_id, message)
     except Exception as e:
-        logger.error(f"خطا در ویرایش پیام {message_id}: {e}")
-        # در صورت خطا، پیام جدید ارسال می‌کنیم
-        return await send_new_price_message(bot, prices)
+        # خطاهای موقت (مثل محدودیت نرخ) نباید باعث ارسال پیام جدید شوند
+        logger.error(f"خطا در ویرایش پیام {message_id} در {channel_id}: {e}")
+        return False
+
+def is_unchanged(channel_id, snapshot):
+    """بررسی اینکه قیمت‌ها نسبت به آخرین انتشار در کانال تغییری نکرده و پیام هنوز کهنه نشده است"""
+    published = last_published.get(channel_id)
+    if published is None or snapshot != published["snapshot"]:
+        return False
+    return asyncio.get_running_loop().time() - published["time"] < STALE_HEARTBEAT_SECONDS
 
-async def update_price_message(bot: Bot):
-    """به‌روزرسانی پیام قیمت (ارسال یا ویرایش)"""
-    prices = get_all_prices()
+def mark_published(channel_id, snapshot):
+    """ثبت آخرین قیمت‌های منتشر شده در کانال"""
+    last_published[channel_id] = {
+        "snapshot": snapshot,
+        "time": asyncio.get_running_loop().time(),
+    }
+
+async def publish_to_channel(bot, channel_id, message, snapshot, semaphore, force_new=False):
+    """ارسال یا ویرایش پیام قیمت در یک کانال"""
+    async with semaphore:
+        try:
+            # تصمیم‌گیری بین ارسال پیام جدید یا ویرایش پیام قبلی
+            if should_send_new_message(channel_id, force_new):
+                result = await send_new_price_message(bot, channel_id, message)
+            elif is_unchanged(channel_id, snapshot):
+                logger.info(f"قیمت‌ها تغییری نکرده‌اند، ویرایش پیام در {channel_id} انجام نمی‌شود")
+                return True
+            else:
+                result = await edit_price_message(bot, channel_id, message)
+        except Exception as e:
+            ERRORS.inc(component="publish")
+            logger.error(f"خطا در انتشار قیمت‌ها در {channel_id}: {e}")
+            return False
+
+    if result:
+        mark_published(channel_id, snapshot)
+    return result
+
+async def scrape_prices(deadline=None, instruments=None):
+    """اجرای get_all_prices خارج از event loop با محدودیت زمانی"""
+    if deadline is None:
+        deadline = SCRAPE_DEADLINE_SECONDS
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    future = loop.run_in_executor(
+        SCRAPE_EXECUTOR,
+        partial(get_all_prices, cycle_timeout=deadline, instruments=instruments, coordinator=scrape_coordinator)
+    )
+    try:
+        # کمی فرصت اضافه برای بستن صفحه‌هایی که در لحظه مهلت در جریان بودند
+        prices = await asyncio.wait_for(future, timeout=deadline + 5)
+    except asyncio.TimeoutError:
+        ERRORS.inc(component="scrape_deadline")
+        logger.error(f"استخراج قیمت‌ها در مهلت {deadline} ثانیه تمام نشد")
+        # آخرین قیمت‌های معتبر با علامت قدیمی بودن منتشر می‌شوند
+        return get_cached_prices(instruments, stale_after=UPDATE_INTERVAL_SECONDS) or None
+    logger.info(f"استخراج قیمت‌ها در {loop.time() - started:.2f} ثانیه انجام شد")
+    return prices
+
+def record_history(prices):
+    """افزودن قیمت‌های استخراج شده (به ریال، یا سنت برای دلاری‌ها) به تاریخچه"""
+    return record_samples(
+        (data['key'], data['timestamp'], data['value'])
+        for section in prices.values()
+        for data in section.values()
+        # قیمت‌های قدیمی (از کش) قبلاً ثبت شده‌اند
+        if not data.get('stale')
+    )
+
+def record_samples(samples):
+    """افزودن نمونه‌های (نماد، زمان، مقدار) به تاریخچه؛ نمونه‌ها را برمی‌گرداند"""
+    samples = list(samples)
+    try:
+        for key, timestamp, value in samples:
+            history.append(key, timestamp, value)
+        history.flush()
+    except Exception as e:
+        ERRORS.inc(component="history")
+        logger.error(f"خطا در ذخیره تاریخچه قیمت‌ها: {e}")
+    return samples
+
+def check_alerts(bot, samples):
+    """بررسی هشدارهای قیمت و ارسال هشدارهای فعال شده (یک پیام برای هر کاربر) در پس‌زمینه"""
+    try:
+        triggered = alert_engine.check(samples)
+    except Exception as e:
+        ERRORS.inc(component="alerts")
+        logger.error(f"خطا در بررسی هشدارهای قیمت: {e}")
+        return
+    if not triggered:
+        return
+    logger.info(f"{len(triggered)} هشدار قیمت فعال شد")
+    task = asyncio.create_task(deliver_alerts(bot, triggered))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def update_price_message(bot: Bot, force_new=False):
+    """به‌روزرسانی پیام قیمت (ارسال یا ویرایش) در همه کانال‌ها"""
+    prices = await scrape_prices()
     if not prices:
         logger.warning("هیچ قیمتی برای به‌روزرسانی دریافت نشد")
         return False
+    check_alerts(bot, record_history(prices))
+    return await publish_prices(bot, prices, force_new)
+
+async def publish_prices(bot, prices, force_new=False):
+    """یک بار قالب‌بندی و انتشار همزمان در همه کانال‌ها"""
+    with FORMAT_SECONDS.time():
+        message = format_price_message(prices)
+    return await publish_message(bot, message, price_snapshot(prices), force_new)
+
+async def publish_message(bot, message, snapshot, force_new=False):
+    """انتشار همزمان یک پیام قالب‌بندی شده در همه کانال‌ها"""
+    semaphore = asyncio.Semaphore(PUBLISH_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    results = await asyncio.gather(*(
+        publish_to_channel(bot, channel_id, message, snapshot, semaphore, force_new)
+        for channel_id in CHANNEL_IDS
+    ))
+    logger.info(
+        f"انتشار در {len(CHANNEL_IDS)} کانال در {loop.time() - started:.2f} ثانیه "
+        f"({sum(results)} موفق)"
+    )
+    return all(results)
+
+def create_bot(token=None, base_url=None, **queue_options):
+    """ساخت Bot با صف ارسال محدودشده؛ base_url برای اشاره به سرور API دیگر"""
+    options = {
+        'global_rate': TELEGRAM_GLOBAL_RATE,
+        'chat_rate_per_minute': TELEGRAM_CHAT_RATE_PER_MINUTE,
+        'max_in_flight': TELEGRAM_MAX_IN_FLIGHT,
+    }
+    options.update(queue_options)
+    request = HTTPXRequest(connection_pool_size=options['max_in_flight'])
+    bot = Bot(token=token or BOT_TOKEN, base_url=base_url or TELEGRAM_BASE_URL, request=request)
+    return SendQueue(bot, **options).start()
+
+def create_pipeline(bot):
+    """خط لوله انتشار جریانی که هر صفحه را به محض استخراج منتشر می‌کند"""
+    return StreamingPipeline(
+        publish=partial(publish_message, bot),
+        on_prices=lambda records: check_alerts(bot, record_samples(
+            (price.key, price.timestamp, price.value) for price in records
+        )),
+        coordinator=scrape_coordinator,
+    )
 
-    # تصمیم‌گیری بین ارسال پیام جدید یا ویرایش پیام قبلی
-    if should_send_new_message():
-        return await send_new_price_message(bot, prices)
-    else:
-        return await edit_price_message(bot, prices)
+async def run_update(bot, force_new=False, pipeline=None):
+    """اجرای یک دور به‌روزرسانی؛ دورهای همزمان پشت سر هم اجرا می‌شوند"""
+    cycle_started = asyncio.get_running_loop().time()
+    async with update_lock:
+        if pipeline is not None:
+            await pipeline.run(force_new=force_new, cycle_timeout=SCRAPE_DEADLINE_SECONDS)
+        else:
+            await update_price_message(bot, force_new=force_new)
+        logger.info(f"وضعیت صف ارسال: {bot.metrics()}")
+        if scrape_coordinator is not None:
+            logger.info(f"وضعیت پردازه‌های استخراج: {scrape_coordinator.stats()}")
+    schedule_retry(bot, cycle_started)
+
+def schedule_retry(bot, cycle_started):
+    """شروع تلاش دوباره برای نمادهای ناموفق، اگر در جریان نباشد"""
+    global retry_task
+    if retry_task is not None and not retry_task.done():
+        return
+    if not get_failed_instruments():
+        return
+    retry_task = asyncio.create_task(retry_failed_instruments(bot, cycle_started))
+
+async def retry_failed_instruments(bot, cycle_started):
+    """
+    استخراج دوباره فقط نمادهای ناموفق با فاصله کوتاه‌تر از دور اصلی؛
+    تا رسیدن به دور بعدی قیمت‌های کش‌شده با علامت قدیمی بودن نمایش داده می‌شوند
+    """
+    loop = asyncio.get_running_loop()
+    delay = RETRY_BACKOFF_SECONDS
+    # زمان از شروع دور اصلی حساب می‌شود تا هیچ تلاشی به دور بعدی نرسد و
+    # قفل به‌روزرسانی را در آن دور نگه ندارد
+    while loop.time() - cycle_started + delay < UPDATE_INTERVAL_SECONDS:
+        await asyncio.sleep(delay)
+        async with update_lock:
+            failed = get_failed_instruments()
+            if not failed:
+                return
+            logger.info(f"تلاش دوباره برای استخراج {[instrument.key for instrument in failed]}")
+            prices = await scrape_prices(instruments=failed)
+            if prices:
+                check_alerts(bot, record_history(prices))
+                await publish_prices(bot, get_cached_prices())
+        delay *= 2
 
 async def schedule_price_updates():
     """زمان‌بندی به‌روزرسانی قیمت‌ها"""
-    bot = Bot(token=BOT_TOKEN)
-    while True:
+    global scrape_coordinator
+    load_state()
+    bot = create_bot()
+    if PUBLISH_MODE not in ('batch', 'stream'):
+        raise ValueError(f"PUBLISH_MODE نامعتبر: {PUBLISH_MODE}")
+    if SCRAPE_MODE not in ('threads', 'sharded'):
+        raise ValueError(f"SCRAPE_MODE نامعتبر: {SCRAPE_MODE}")
+    if SCRAPE_MODE == 'sharded':
+        scrape_coordinator = ScrapeCoordinator(SCRAPE_WORKERS).start()
+    pipeline = create_pipeline(bot) if PUBLISH_MODE == 'stream' else None
+    logger.info(f"حالت انتشار: {PUBLISH_MODE}")
+    commands_task = None
+    if BOT_COMMANDS:
+        # پاسخ‌ها هرگز استخراج جدیدی شروع نمی‌کنند
+        application = build_application(BOT_TOKEN, QuoteCache(), bot, base_url=TELEGRAM_BASE_URL)
+        add_alert_handlers(application, alert_engine, bot, price_cache)
+        # وظیفه‌ای جدا که خطاهایش را خودش با تأخیر دوباره امتحان می‌کند،
+        # تا خرابی دستورات هرگز انتشار در کانال‌ها را متوقف نکند
+        commands_task = asyncio.create_task(serve_commands(application), name="bot commands")
+    try:
+        await asyncio.gather(
+            # به‌روزرسانی با نرخ ثابت (هر یک دقیقه) بدون انباشت تأخیر
+            run_at_fixed_rate(
+                partial(run_update, bot, pipeline=pipeline), UPDATE_INTERVAL_SECONDS, name="price update"
+            ),
+            # ارسال پیام جدید دقیقاً در زمان‌های مشخص شده
+            run_daily(
+                partial(run_update, bot, force_new=True, pipeline=pipeline), SEND_TIMES, IRAN_TZ,
+                name="new price message"
+            ),
+            # نوشتن تغییرات وضعیت روی دیسک
+            state.run_write_behind(),
+        )
+    finally:
+        if commands_task is not None:
+            commands_task.cancel()
+
+async def delete_old_price_messages(bot, channel_id, message_ids):
+    """حذف دسته‌ای پیام‌های قیمت قبلی و به‌روزرسانی تدریجی فایل وضعیت"""
+    logger.info(f"تلاش برای حذف {len(message_ids)} پیام قدیمی در {channel_id}")
+    deleted_count = 0
+
+    for start in range(0, len(message_ids), DELETE_BATCH_SIZE):
+        batch = message_ids[start:start + DELETE_BATCH_SIZE]
         try:
-            await update_price_message(bot)
-            await asyncio.sleep(60)  # هر یک دقیقه
+            await bot.delete_messages(chat_id=channel_id, message_ids=batch)
+            deleted_count += len(batch)
+        except BadRequest as e:
+            # پیام‌هایی که قابل حذف نیستند دوباره امتحان نمی‌شوند
+            logger.error(f"خطا در حذف پیام‌های {batch}: {e}")
+        except TelegramError as e:
+            # خطای موقت: شناسه‌ها برای تلاش بعدی باقی می‌مانند
+            logger.error(f"خطا در حذف پیام‌های {batch}: {e}")
+            continue
         except Exception as e:
-            logger.error(f"خطا در به‌روزرسانی قیمت‌ها: {e}")
-            await asyncio.sleep(60)
+            logger.error(f"خطا در حذف پیام‌های قدیمی: {e}")
+            continue
+        remove_price_message_ids(channel_id, batch)
 
-async def find_and_delete_old_price_messages(bot, channel_id):
-    from telegram.error import TelegramError
-    try:
-        # دریافت شناسه‌های پیام‌های قبلی
-        message_ids = get_saved_price_message_ids()
-        
-        if not message_ids:
-            logger.info("هیچ پیام قبلی برای حذف یافت نشد")
-            return
-            
-        logger.info(f"تلاش برای حذف {len(message_ids)} پیام قدیمی: {message_ids}")
-        deleted_count = 0
-        
-        # حذف تمام پیام‌های قبلی
-        for msg_id in message_ids:
-            try:
-                await bot.delete_message(chat_id=channel_id, message_id=msg_id)
-                logger.info(f"پیام قدیمی با ID {msg_id} حذف شد")
-                deleted_count += 1
-            except TelegramError as e:
-                logger.error(f"خطا در حذف پیام {msg_id}: {e}")
-                
-        # پاک کردن فایل پس از حذف پیام‌ها
-        with open(PRICE_MESSAGES_FILE, 'w') as f:
-            json.dump([], f)
-            
-        logger.info(f"تعداد {deleted_count} پیام حذف شد")
-    except Exception as e:
-        logger.error(f"خطا در حذف پیام‌های قدیمی: {e}")
+    logger.info(f"تعداد {deleted_count} پیام از {channel_id} حذف شد")
 
 def main():
     logger.info("شروع ربات قیمت‌ها...")
-    asyncio.run(schedule_price_updates())
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT, METRICS_HOST)
+    try:
+        asyncio.run(schedule_price_updates())
+    finally:
+        if scrape_coordinator is not None:
+            scrape_coordinator.stop()
+        state.flush()
+        history.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
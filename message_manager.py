@@ -1,10 +1,10 @@
-import os
 from datetime import datetime
 import pytz
 import logging
 
+from price_model import format_value, unit_label
+
 PRICE_MESSAGE_KEYWORD = "قیمت‌های لحظه‌ای"
-LATEST_MESSAGE_FILE = "latest_message_id.txt"
 IRAN_TZ = pytz.timezone('Asia/Tehran')
 
 
@@ -12,17 +12,24 @@ def get_iran_time_now():
     return datetime.now(IRAN_TZ)
 
 
-def is_send_time(current_time, send_times):
+def stale_minutes(data):
+    """
+    عمر قیمت کش‌شده به دقیقه، یا None اگر قیمت تازه است
+    """
+    if not data.get('stale'):
+        return None
+    return max(1, int(data.get('age', 0)) // 60)
+
+
+def format_price_line(name, data):
     """
-    بررسی می‌کند که آیا زمان فعلی یکی از زمان‌های ارسال پیام است یا خیر
+    یک خط قیمت؛ قیمت‌های قدیمی (از کش) با عمرشان علامت‌گذاری می‌شوند
     """
-    for send_time in send_times:
-        if (
-            send_time.hour == current_time.hour and
-            abs(send_time.minute - current_time.minute) <= 5
-        ):
-            return True
-    return False
+    line = f"📊 {name}: {format_value(data['value'], data['unit'])} {unit_label(data['unit'])}"
+    minutes = stale_minutes(data)
+    if minutes is not None:
+        line += f" ⏳ ({minutes} دقیقه پیش)"
+    return line + "\n"
 
 
 def format_price_message(prices):
@@ -34,45 +41,29 @@ def format_price_message(prices):
     text = f"💵 {PRICE_MESSAGE_KEYWORD} 💵\n\n"
     if 'currencies' in prices:
         for name, data in prices['currencies'].items():
-            text += f"📊 {name}: {data.get('price', 'N/A')} تومان\n"
+            text += format_price_line(name, data)
     if 'gold' in prices:
         text += "\n"
         for name, data in prices['gold'].items():
-            text += f"📊 {name}: {data.get('price', 'N/A')} تومان\n"
+            text += format_price_line(name, data)
     if 'coin' in prices:
         text += "\n"
         for name, data in prices['coin'].items():
-            text += f"📊 {name}: {data.get('price', 'N/A')} تومان\n"
+            text += format_price_line(name, data)
     text += f"\n🔄 <b>قیمت‌ها هر یک دقیقه یکبار به‌روز می‌شوند</b>\n"
     text += f"⏰ آخرین به‌روزرسانی: {date_str}"
     return text
 
 
-def save_latest_message_id(message_id):
+def price_snapshot(prices):
     """
-    ذخیره آخرین شناسه پیام در فایل
+    خلاصه قابل مقایسه قیمت‌ها (بدون زمان) برای تشخیص تغییر
     """
-    try:
-        with open(LATEST_MESSAGE_FILE, 'w') as f:
-            f.write(str(message_id))
-        logging.info(f"آخرین شناسه پیام {message_id} در {LATEST_MESSAGE_FILE} ذخیره شد")
-    except Exception as e:
-        logging.error(f"خطا در ذخیره آخرین شناسه پیام: {e}")
-
-
-def get_latest_message_id_from_file():
-    """
-    دریافت آخرین شناسه پیام از فایل
-    """
-    try:
-        if not os.path.exists(LATEST_MESSAGE_FILE):
-            return None
-        with open(LATEST_MESSAGE_FILE, 'r') as f:
-            message_id = f.read().strip()
-            return int(message_id) if message_id else None
-    except Exception as e:
-        logging.error(f"خطا در خواندن آخرین شناسه پیام: {e}")
-        return None
+    return tuple(
+        (category, name, data.get('value'), stale_minutes(data))
+        for category in ('currencies', 'gold', 'coin')
+        for name, data in prices.get(category, {}).items()
+    )
 
 
 async def find_and_delete_old_price_messages(bot, channel_id):
@@ -0,0 +1,277 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets (seconds), from a cached DOM read to a cold Chrome start
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels
+    """
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_number(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of the ``with`` block, also when it raises
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def count(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        return series[2] if series else 0
+
+    def drain(self):
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series):
+        with self._lock:
+            for key, (counts, total, count) in series.items():
+                current = self._series.get(key)
+                if current is None:
+                    current = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+                current[0] = [mine + theirs for mine, theirs in zip(current[0], counts)]
+                current[1] += total
+                current[2] += count
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_number(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Set of metrics rendered together in the Prometheus text format
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def drain(self):
+        """
+        Values recorded since the last drain, by metric name, resetting them.
+        A worker process hands these to the process serving /metrics, which
+        adds them with merge().
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        samples = {}
+        for metric in metrics:
+            values = metric.drain()
+            if values:
+                samples[metric.name] = values
+        return samples
+
+    def merge(self, samples):
+        """
+        Add the values drained from another process's registry
+        """
+        for name, values in samples.items():
+            with self._lock:
+                metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Scraper
+DRIVER_LAUNCH_SECONDS = REGISTRY.histogram(
+    "tgju_driver_launch_seconds", "Time to start a Chrome driver")
+PAGE_LOAD_SECONDS = REGISTRY.histogram(
+    "tgju_page_load_seconds", "Time to load a page until its prices are ready", ("engine", "url"))
+EXTRACTION_SECONDS = REGISTRY.histogram(
+    "tgju_extraction_seconds", "Time to extract prices from a loaded page", ("engine", "mode"))
+PRICE_LOOKUPS = REGISTRY.counter(
+    "tgju_price_lookups", "Price lookups by the method that found them (id, table, market_row, missing)",
+    ("method",))
+ENGINE_FALLBACKS = REGISTRY.counter(
+    "tgju_engine_fallbacks", "Instruments an engine missed and handed to the next one (feed -> http -> selenium)",
+    ("engine",))
+SCRAPE_CYCLE_SECONDS = REGISTRY.histogram(
+    "tgju_scrape_cycle_seconds", "Duration of a full get_all_prices cycle")
+SCRAPE_WORKER_RESTARTS = REGISTRY.counter(
+    "tgju_scrape_worker_restarts", "Scrape worker processes replaced after dying or going silent")
+SCRAPE_REASSIGNMENTS = REGISTRY.counter(
+    "tgju_scrape_reassignments", "Pages handed to another worker after theirs was replaced")
+
+# Publishing
+FORMAT_SECONDS = REGISTRY.histogram(
+    "tgju_format_seconds", "Time to render the price message")
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram(
+    "tgju_pipeline_stage_seconds", "Latency of each streaming pipeline stage", ("stage",))
+TELEGRAM_REQUEST_SECONDS = REGISTRY.histogram(
+    "tgju_telegram_request_seconds", "Duration of Bot API calls", ("method",))
+TELEGRAM_RETRY_AFTER = REGISTRY.counter(
+    "tgju_telegram_retry_after", "Bot API calls rejected with RetryAfter", ("method",))
+
+# Alerts
+ALERT_CHECK_SECONDS = REGISTRY.histogram(
+    "tgju_alert_check_seconds", "Time to find the alerts crossed by one price tick")
+ALERTS_TRIGGERED = REGISTRY.counter(
+    "tgju_alerts_triggered", "Price alerts that fired")
+
+ERRORS = REGISTRY.counter(
+    "tgju_errors", "Errors by component", ("component",))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the bot log
+        pass
+
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """
+    Serve ``registry`` on http://host:port/metrics from a daemon thread
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from instruments import get_instruments, group_by_page
+from metrics import FORMAT_SECONDS, PIPELINE_STAGE_SECONDS
+from message_manager import format_price_message, price_snapshot
+from price_extractor_v2 import DEFAULT_PAGE_TIMEOUT, get_cached_prices, get_page_prices, price_cache
+from price_model import parse_instrument_value, validate_price
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "parse", "validate", "diff", "render", "publish")
+
+# Number of recent samples kept per stage for percentiles
+STAGE_SAMPLES = 1000
+
+# Page fetches run here so the event loop keeps publishing finished pages
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=3, thread_name_prefix="pipeline")
+
+
+class StageTimings:
+    """
+    Recent latencies (seconds) of each pipeline stage
+    """
+
+    def __init__(self, samples=STAGE_SAMPLES):
+        self._samples = defaultdict(lambda: deque(maxlen=samples))
+
+    def record(self, stage, seconds):
+        self._samples[stage].append(seconds)
+        PIPELINE_STAGE_SECONDS.observe(seconds, stage=stage)
+
+    def summary(self):
+        summary = {}
+        for stage in STAGES:
+            samples = self._samples.get(stage)
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            summary[stage] = {
+                "count": len(ordered),
+                "avg": round(sum(ordered) / len(ordered), 4),
+                "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 4),
+                "max": round(ordered[-1], 4),
+            }
+        return summary
+
+
+class StreamingPipeline:
+    """
+    Scrape-to-publish pipeline that publishes every page as soon as it is done.
+
+    Each page goes through fetch -> parse -> validate -> diff, and only a page
+    that changed a price is rendered into the full message (fresh rows plus
+    cached ones) and handed to ``publish(message, snapshot, force_new)``, so a
+    fast page is never held back by a slow one. Rapid successive edits are
+    merged by the send queue's edit coalescing. ``on_prices`` receives the
+    fresh prices of each page (e.g. to record history). With a
+    ``coordinator`` the pages are fetched by its worker processes.
+    """
+
+    def __init__(self, publish, on_prices=None, headless=True, engine=None, timings=None, coordinator=None):
+        self.publish = publish
+        self.coordinator = coordinator
+        self.on_prices = on_prices
+        self.headless = headless
+        self.engine = engine
+        self.timings = timings or StageTimings()
+
+    def _fetch(self, url, instruments):
+        started = time.monotonic()
+        sources = {}
+        raw = get_page_prices(url, instruments, headless=self.headless, engine=self.engine, sources=sources)
+        return raw, sources, time.monotonic() - started
+
+    def _parse(self, instruments, raw):
+        started = time.monotonic()
+        values = {}
+        for instrument in instruments:
+            if instrument.key in raw:
+                value = parse_instrument_value(instrument, raw[instrument.key])
+                if value is not None:
+                    values[instrument.key] = value
+        self.timings.record("parse", time.monotonic() - started)
+        return values
+
+    def _validate(self, instruments, values, sources):
+        started = time.monotonic()
+        scraped_at = time.time()
+        prices = []
+        for instrument in instruments:
+            if instrument.key not in values:
+                continue
+            price = validate_price(
+                instrument, values[instrument.key], sources.get(instrument.key, "unknown"), scraped_at
+            )
+            if price is not None:
+                prices.append(price)
+        self.timings.record("validate", time.monotonic() - started)
+        return prices
+
+    def _diff(self, instruments, prices):
+        """
+        Store the page in the cache; True if any published row changes
+        """
+        started = time.monotonic()
+        changed = False
+        fresh = {price.key for price in prices}
+        for price in prices:
+            cached = price_cache.get(price.key)
+            if cached is None or cached.stale or cached.price.value != price.value:
+                changed = True
+            price_cache.update(price)
+        for instrument in instruments:
+            if instrument.key not in fresh:
+                cached = price_cache.get(instrument.key)
+                if cached is not None and not cached.stale:
+                    changed = True
+                price_cache.mark_stale(instrument.key)
+        self.timings.record("diff", time.monotonic() - started)
+        return changed
+
+    async def _render_and_publish(self, tracked, force_new):
+        started = time.monotonic()
+        prices = get_cached_prices(tracked)
+        if not prices:
+            logger.warning("No prices to publish yet")
+            return False
+        with FORMAT_SECONDS.time():
+            message = format_price_message(prices)
+        snapshot = price_snapshot(prices)
+        self.timings.record("render", time.monotonic() - started)
+
+        started = time.monotonic()
+        result = await self.publish(message, snapshot, force_new)
+        self.timings.record("publish", time.monotonic() - started)
+        return result
+
+    async def run(self, force_new=False, instruments=None, cycle_timeout=None):
+        """
+        Run one cycle; returns the number of publishes
+        """
+        if instruments is None:
+            instruments = get_instruments()
+        if cycle_timeout is None:
+            cycle_timeout = float(os.getenv("PAGE_TIMEOUT", DEFAULT_PAGE_TIMEOUT))
+        loop = asyncio.get_running_loop()
+        cycle_started = loop.time()
+        pages = group_by_page(instruments)
+        futures = {
+            (
+                asyncio.wrap_future(
+                    self.coordinator.submit_page(url, page_instruments, self.headless, self.engine)
+                )
+                if self.coordinator is not None
+                else loop.run_in_executor(FETCH_EXECUTOR, self._fetch, url, page_instruments)
+            ): url
+            for url, page_instruments in pages.items()
+        }
+
+        publishes = 0
+        pending = set(futures)
+        while pending:
+            remaining = cycle_timeout - (loop.time() - cycle_started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                url = futures[future]
+                page_instruments = pages[url]
+                try:
+                    raw, sources, elapsed = future.result()
+                except Exception as e:
+                    logger.error(f"Error scraping {url}: {e}")
+                    raw, sources, elapsed = {}, {}, None
+                if elapsed is not None:
+                    self.timings.record("fetch", elapsed)
+
+                values = self._parse(page_instruments, raw)
+                prices = self._validate(page_instruments, values, sources)
+                if prices and self.on_prices is not None:
+                    self.on_prices(prices)
+                if not self._diff(page_instruments, prices):
+                    continue
+                # The first publish of the cycle decides about a new message
+                await self._render_and_publish(instruments, force_new and publishes == 0)
+                publishes += 1
+                logger.info(f"Published {url} after {loop.time() - cycle_started:.2f}s")
+
+        timed_out_changed = False
+        for future in pending:
+            url = futures[future]
+            logger.error(f"Timed out scraping {url} after {cycle_timeout}s")
+            for instrument in pages[url]:
+                cached = price_cache.get(instrument.key)
+                if cached is not None and not cached.stale:
+                    timed_out_changed = True
+                price_cache.mark_stale(instrument.key)
+
+        # Nothing changed (heartbeat, scheduled new message) or pages timed out
+        if publishes == 0 or timed_out_changed:
+            await self._render_and_publish(instruments, force_new and publishes == 0)
+            publishes += 1
+
+        logger.info(
+            f"Pipeline cycle finished in {loop.time() - cycle_started:.2f}s with {publishes} publish(es); "
+            f"stage timings: {self.timings.summary()}"
+        )
+        return publishes
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from instruments import CATEGORIES
+
+
+class CachedPrice:
+    """
+    Last good Price of one instrument and whether the latest scrape failed
+    """
+    __slots__ = ("price", "stale")
+
+    def __init__(self, price):
+        self.price = price
+        self.stale = False
+
+
+class PriceCache:
+    """
+    Last-known-good price of every instrument with freshness metadata.
+
+    A successful scrape stores its ``Price`` record (value, time and
+    source); a failed one only marks the cached entry stale, so it can still
+    be published with its age.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Bumped on every change, so readers can cache what they render from it
+        self.version = 0
+
+    def update(self, price):
+        with self._lock:
+            self._entries[price.key] = CachedPrice(price)
+            self.version += 1
+
+    def mark_stale(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and not cached.stale:
+                cached.stale = True
+                self.version += 1
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def failed_keys(self, instruments):
+        """
+        Keys of instruments whose last scrape failed (stale or never scraped)
+        """
+        with self._lock:
+            return [
+                instrument.key for instrument in instruments
+                if instrument.key not in self._entries or self._entries[instrument.key].stale
+            ]
+
+    def view(self, instruments, now=None, stale_after=None):
+        """
+        Price dict in the get_all_prices layout built from the cache: each
+        entry holds the numeric ``value`` and ``unit`` with ``timestamp``,
+        ``source``, ``stale`` and ``age``. Entries older than ``stale_after``
+        seconds count as stale too.
+        """
+        now = now or time.time()
+        prices = {}
+        with self._lock:
+            for category in CATEGORIES:
+                section = {}
+                for instrument in instruments:
+                    cached = self._entries.get(instrument.key)
+                    if instrument.category != category or cached is None:
+                        continue
+                    price = cached.price
+                    age = max(0, int(now - price.timestamp))
+                    section[instrument.display_name] = {
+                        "key": price.key,
+                        "value": price.value,
+                        "unit": price.unit,
+                        "timestamp": price.timestamp,
+                        "source": price.source,
+                        "stale": cached.stale or (stale_after is not None and age > stale_after),
+                        "age": age,
+                    }
+                if section:
+                    prices[category] = section
+        return prices
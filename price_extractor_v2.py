@@ -1,14 +1,37 @@
+import atexit
 import logging
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-import re
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import feed_extractor
+import http_extractor
+from driver_pool import DriverPool
+from metrics import (
+    DRIVER_LAUNCH_SECONDS,
+    ENGINE_FALLBACKS,
+    ERRORS,
+    EXTRACTION_SECONDS,
+    PAGE_LOAD_SECONDS,
+    PRICE_LOOKUPS,
+    SCRAPE_CYCLE_SECONDS,
+)
+from instruments import (
+    get_instruments,
+    group_by_page,
+    page_targets,
+)
+from price_cache import PriceCache
+from price_model import format_value, parse_instrument_price
+from price_parsing import parse_price, resolve_prices
 
 # Logging configuration
 logging.basicConfig(
@@ -17,24 +40,124 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# URL addresses
-CURRENCY_URL = "https://www.tgju.org/currency"
-GOLD_URL = "https://www.tgju.org/gold-chart"
-COIN_URL = "https://www.tgju.org/coin"
+# Driver pool settings (overridable via environment)
+DEFAULT_DRIVER_POOL_SIZE = 3
+DEFAULT_DRIVER_MAX_PAGES = 50
+# Upper bound for a single page scrape when pages are fetched in parallel
+DEFAULT_PAGE_TIMEOUT = 40
+
+# Upper bound for waiting on price elements after navigation
+DEFAULT_READY_TIMEOUT = 10
+
+# Lean browsing profile (CHROME_LEAN, default on): the prices are plain
+# text filled in by tgju's own scripts, so images, fonts, media, ads,
+# analytics and chart libraries are blocked, page loads return at
+# DOMContentLoaded and Chrome runs with a small window and fewer services
+LEAN_WINDOW_SIZE = "1280,800"
+BLOCKED_EXTENSIONS = (
+    "png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico",
+    "woff", "woff2", "ttf", "otf", "eot",
+    "mp4", "webm", "mp3",
+)
+BLOCKED_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "adservice.google.com", "clarity.ms", "hotjar.com", "yektanet.com", "mediaad.org",
+    "najva.com", "pushe.co", "highcharts.com", "amcharts.com", "tradingview.com",
+)
+LEAN_CHROME_ARGUMENTS = (
+    "--blink-settings=imagesEnabled=false",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,InterestFeedContentSuggestions",
+    "--mute-audio",
+    "--no-first-run",
+)
+
+# Navigation and readiness durations (seconds) of the last load of each URL
+page_load_timings = {}
+
+# Per-URL and total durations (seconds) of the most recent get_all_prices call
+last_cycle_timings = {}
+
+# Last-known-good price of every instrument scraped so far
+price_cache = PriceCache()
+
+_driver_pools = {}
+_driver_pools_lock = threading.Lock()
+_chromedriver_path = None
+# Page threads launch drivers at the same time; only one may download into ~/.wdm
+_chromedriver_path_lock = threading.Lock()
+
+def get_chromedriver_path():
+    """
+    Resolve the chromedriver binary once instead of on every driver launch
+    """
+    global _chromedriver_path
+    with _chromedriver_path_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager().install()
+        return _chromedriver_path
+
+def blocked_url_patterns():
+    """
+    DevTools URL patterns blocked by the lean profile, plus the comma
+    separated CHROME_BLOCKED_URLS
+    """
+    patterns = []
+    for extension in BLOCKED_EXTENSIONS:
+        patterns.extend((f"*.{extension}", f"*.{extension}?*"))
+    patterns.extend(f"*{domain}*" for domain in BLOCKED_DOMAINS)
+    patterns.extend(
+        pattern.strip() for pattern in os.getenv("CHROME_BLOCKED_URLS", "").split(",") if pattern.strip()
+    )
+    return patterns
+
+def block_resources(driver):
+    """
+    Block non-essential requests of ``driver`` through the DevTools protocol
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns()})
+    except Exception as e:
+        logger.warning(f"Could not set up request blocking: {str(e)}")
 
-def setup_driver(headless=True):
+def setup_driver(headless=True, lean=None, performance_log=False):
     """
     Set up the Selenium webdriver
+
+    ``lean`` (CHROME_LEAN, default on) applies the lean browsing profile;
+    ``performance_log`` records DevTools network events for benchmarks.
     """
+    if lean is None:
+        lean = os.getenv("CHROME_LEAN", "1") != "0"
+    started = time.monotonic()
     try:
         chrome_options = Options()
         if headless:
             chrome_options.add_argument('--headless=new')
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--window-size=1920,1080')
         chrome_options.add_argument('--disable-extensions')
         chrome_options.add_argument('--disable-gpu')
+        if lean:
+            chrome_options.add_argument(f'--window-size={LEAN_WINDOW_SIZE}')
+            for argument in LEAN_CHROME_ARGUMENTS:
+                chrome_options.add_argument(argument)
+            chrome_options.add_experimental_option('prefs', {
+                'profile.managed_default_content_settings.images': 2,
+                'profile.default_content_setting_values.notifications': 2,
+            })
+            # Return from driver.get() at DOMContentLoaded; open_page waits
+            # for the price elements themselves
+            chrome_options.page_load_strategy = 'eager'
+        else:
+            chrome_options.add_argument('--window-size=1920,1080')
+        if performance_log:
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
         
         # Try to use a fixed browser if available
         chrome_paths = [
@@ -71,7 +194,7 @@ def setup_driver(headless=True):
         
         try:
             # First try using the ChromeDriverManager approach
-            service = Service(ChromeDriverManager().install())
+            service = Service(get_chromedriver_path())
             driver = webdriver.Chrome(service=service, options=chrome_options)
         except Exception as e:
             logger.warning(f"Failed to use ChromeDriverManager: {str(e)}")
@@ -92,411 +215,286 @@ def setup_driver(headless=True):
                     driver = webdriver.Chrome(service=service, options=chrome_options)
         
         driver.set_page_load_timeout(30)
+        if lean:
+            block_resources(driver)
+        DRIVER_LAUNCH_SECONDS.observe(time.monotonic() - started)
         return driver
     except Exception as e:
+        ERRORS.inc(component="driver_launch")
         logger.error(f"Error setting up Selenium driver: {str(e)}")
         raise
 
-def get_currency_prices(headless=True):
+def get_driver_pool(headless=True):
     """
-    Get currency prices from the currency page
+    Get the shared driver pool, creating it on first use
+    """
+    with _driver_pools_lock:
+        pool = _driver_pools.get(headless)
+        if pool is None:
+            pool = DriverPool(
+                lambda: setup_driver(headless=headless),
+                size=int(os.getenv("DRIVER_POOL_SIZE", DEFAULT_DRIVER_POOL_SIZE)),
+                max_pages=int(os.getenv("DRIVER_MAX_PAGES", DEFAULT_DRIVER_MAX_PAGES)),
+            )
+            _driver_pools[headless] = pool
+        return pool
+
+def close_driver_pools():
+    """
+    Quit all pooled drivers (call on shutdown)
+    """
+    with _driver_pools_lock:
+        pools = list(_driver_pools.values())
+        _driver_pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_driver_pools)
+
+# Ready when every price element has text, or when the market tables are
+# rendered and some price element is absent (the table fallbacks take over)
+READY_SCRIPT = """
+var ids = arguments[0];
+var missing = false, empty = false;
+for (var i = 0; i < ids.length; i++) {
+    var element = document.getElementById(ids[i]);
+    if (!element) { missing = true; }
+    else if (!element.textContent.trim()) { empty = true; }
+}
+if (!missing && !empty) { return 'ids'; }
+if (missing && document.readyState === 'complete' &&
+        document.querySelector('table.market-table td')) { return 'tables'; }
+return null;
+"""
+
+def open_page(driver, url, element_ids, timeout=None):
+    """
+    Navigate to ``url`` and return as soon as the price elements are ready,
+    waiting at most ``timeout`` seconds (READY_TIMEOUT)
     """
-    driver = None
+    if timeout is None:
+        timeout = float(os.getenv("READY_TIMEOUT", DEFAULT_READY_TIMEOUT))
+
+    started = time.monotonic()
+    driver.get(url)
+    navigated = time.monotonic()
+
+    ready_via = None
     try:
-        logger.info("Getting currency prices...")
-        driver = setup_driver(headless=headless)
-        
-        # Open currency page
-        driver.get(CURRENCY_URL)
-        logger.info(f"Currency page opened: {CURRENCY_URL}")
-        
-        # Wait for the page to load completely
-        time.sleep(5)
-        
-        currencies = {}
-        
-        # Method 1: Try to find currencies directly with ID
+        ready_via = WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+            lambda d: d.execute_script(READY_SCRIPT, element_ids)
+        )
+    except TimeoutException:
+        logger.warning(f"Price elements on {url} not ready after {timeout}s, continuing")
+    ready = time.monotonic()
+
+    page_load_timings[url] = {
+        "navigate": round(navigated - started, 3),
+        "ready": round(ready - navigated, 3),
+        "total": round(ready - started, 3),
+        "ready_via": ready_via,
+    }
+    PAGE_LOAD_SECONDS.observe(ready - started, engine="selenium", url=url)
+    logger.info(f"Page opened: {url} {page_load_timings[url]}")
+    return ready_via
+
+# Collect every price ID, market-table row and .market-table-row of a page in
+# a single WebDriver round trip
+SNAPSHOT_SCRIPT = """
+var ids = arguments[0];
+var text = function (element) { return (element.innerText || element.textContent || '').trim(); };
+var snapshot = {ids: {}, tables: [], market_rows: []};
+for (var i = 0; i < ids.length; i++) {
+    var element = document.getElementById(ids[i]);
+    if (element) { snapshot.ids[ids[i]] = text(element); }
+}
+document.querySelectorAll('table.market-table tr').forEach(function (row) {
+    var cells = row.querySelectorAll('td');
+    if (cells.length >= 2) { snapshot.tables.push([text(cells[0]), text(cells[1])]); }
+});
+document.querySelectorAll('.market-table-row').forEach(function (row) {
+    var name = row.querySelector('.market-name');
+    var price = row.querySelector('.market-price');
+    if (name && price) { snapshot.market_rows.push([text(name), text(price)]); }
+});
+return snapshot;
+"""
+
+DOM_EXTRACTION_MODES = ("script", "walk")
+
+ENGINES = ("http", "selenium", "feed")
+
+def read_page_snapshot(driver, element_ids):
+    """
+    Read the price elements and table rows of the opened page with one execute_script call
+    """
+    return driver.execute_script(SNAPSHOT_SCRIPT, list(element_ids)) or {}
+
+def _walk_page(driver, targets):
+    """
+    Per-element extraction: one WebDriver round trip per element, row and cell
+    """
+    found = {}
+
+    # Method 1: Try to find prices directly with ID
+    for key, (element_id, _) in targets.items():
         try:
-            # For dollar
-            dollar_element = driver.find_element(By.ID, "l-price_dollar_rl")
-            if dollar_element:
-                price_text = dollar_element.text.strip()
-                if price_text:
-                    logger.info(f"Dollar price with ID: {price_text}")
-                    # Extract only the price number using regex
-                    import re
-                    # Search for numeric pattern with commas
-                    price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                    if price_match:
-                        clean_price = price_match.group(1)
-                        logger.info(f"Cleaned dollar price: {clean_price}")
-                        currencies['dollar'] = clean_price
-                    else:
-                        currencies['dollar'] = price_text
-                    
-            # For euro
-            euro_element = driver.find_element(By.ID, "l-price_eur")
-            if euro_element:
-                price_text = euro_element.text.strip()
-                if price_text:
-                    logger.info(f"Euro price with ID: {price_text}")
-                    # Extract only the price number using regex
-                    import re
-                    # Search for numeric pattern with commas
-                    price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                    if price_match:
-                        clean_price = price_match.group(1)
-                        logger.info(f"Cleaned euro price: {clean_price}")
-                        currencies['euro'] = clean_price
-                    else:
-                        currencies['euro'] = price_text
+            price_text = driver.find_element(By.ID, element_id).text.strip()
+            if price_text:
+                found[key] = price_text
+                PRICE_LOOKUPS.inc(method="id")
         except Exception as e:
-            logger.warning(f"Error finding currencies with ID: {str(e)}")
-        
-        # Method 2: Search in tables
-        if 'dollar' not in currencies or 'euro' not in currencies:
-            # Find all market-table tables
-            tables = driver.find_elements(By.CSS_SELECTOR, "table.market-table")
-            logger.info(f"Number of tables found: {len(tables)}")
-            
-            # Save page HTML for debugging
-            page_source = driver.page_source
-            with open("page_debug.html", "w", encoding="utf-8") as f:
-                f.write(page_source)
-            logger.info("Page HTML saved for debugging")
-            
-            # For each table, check rows
-            for table_idx, table in enumerate(tables):
-                logger.info(f"Checking table number {table_idx+1}")
-                rows = table.find_elements(By.TAG_NAME, "tr")
-                logger.info(f"Number of rows in table {table_idx+1}: {len(rows)}")
-                
-                # Traverse table rows
-                for row_idx, row in enumerate(rows):
-                    try:
-                        cells = row.find_elements(By.TAG_NAME, "td")
-                        if len(cells) < 2:
-                            continue
-                        
-                        # Check currency name
-                        name_cell = cells[0]
-                        currency_name = name_cell.text.strip()
-                        logger.info(f"Currency name in row {row_idx+1}: {currency_name}")
-                        
-                        # Column 2: Live price
-                        price_cell = cells[1]
-                        price_text = price_cell.text.strip()
-                        logger.info(f"Raw price text: {price_text}")
-                        
-                        # Extract only the price number using regex
-                        import re
-                        # Search for numeric pattern with commas
-                        price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                        if price_match:
-                            clean_price = price_match.group(1)
-                            logger.info(f"Cleaned price from table: {clean_price}")
-                            
-                            # Check if this currency is dollar or euro
-                            if "دلار" in currency_name and 'dollar' not in currencies:
-                                logger.info(f"Dollar price from table (cleaned): {clean_price}")
-                                currencies['dollar'] = clean_price
-                            
-                            if "یورو" in currency_name and 'euro' not in currencies:
-                                logger.info(f"Euro price from table (cleaned): {clean_price}")
-                                currencies['euro'] = clean_price
-                        else:
-                            # Remove parentheses and content inside
-                            price_text = re.sub(r'\([^)]*\)', '', price_text).strip()
-                            
-                            # Check if this currency is dollar or euro
-                            if "دلار" in currency_name and len(price_text) > 0 and 'dollar' not in currencies:
-                                logger.info(f"Dollar price from table: {price_text}")
-                                currencies['dollar'] = price_text
-                            
-                            if "یورو" in currency_name and len(price_text) > 0 and 'euro' not in currencies:
-                                logger.info(f"Euro price from table: {price_text}")
-                                currencies['euro'] = price_text
-                        
-                        # If both currencies found, exit loop
-                        if 'dollar' in currencies and 'euro' in currencies:
-                            break
-                            
-                    except Exception as e:
-                        logger.warning(f"Error processing row {row_idx+1}: {str(e)}")
-                        continue
-                        
-                # If both currencies found, exit loop
-                if 'dollar' in currencies and 'euro' in currencies:
-                    break
-        
-        # Method 3: Use alternative selectors
-        if 'dollar' not in currencies or 'euro' not in currencies:
-            # Search with more specific selector
-            rows = driver.find_elements(By.CSS_SELECTOR, ".market-table-row")
-            logger.info(f"Number of rows found with direct selector: {len(rows)}")
-            
-            for row in rows:
+            logger.warning(f"Error finding {key} with ID: {str(e)}")
+    remaining = {key: target for key, target in targets.items() if key not in found}
+
+    def match_row(name, price_cell, method):
+        for key, (_, name_patterns) in list(remaining.items()):
+            if any(pattern in name for pattern in name_patterns):
+                price_text = price_cell.text.strip()
+                if price_text:
+                    found[key] = price_text
+                    del remaining[key]
+                    PRICE_LOOKUPS.inc(method=method)
+
+    # Method 2: Search in tables
+    if remaining:
+        for table in driver.find_elements(By.CSS_SELECTOR, "table.market-table"):
+            for row in table.find_elements(By.TAG_NAME, "tr"):
                 try:
-                    name_element = row.find_element(By.CSS_SELECTOR, ".market-name")
-                    price_element = row.find_element(By.CSS_SELECTOR, ".market-price")
-                    
-                    currency_name = name_element.text.strip()
-                    price_text = price_element.text.strip()
-                    
-                    # Extract only the price number using regex
-                    import re
-                    # Search for numeric pattern with commas
-                    price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                    if price_match:
-                        clean_price = price_match.group(1)
-                        
-                        if "دلار" in currency_name and 'dollar' not in currencies:
-                            logger.info(f"Dollar price with specific selector (cleaned): {clean_price}")
-                            currencies['dollar'] = clean_price
-                        
-                        if "یورو" in currency_name and 'euro' not in currencies:
-                            logger.info(f"Euro price with specific selector (cleaned): {clean_price}")
-                            currencies['euro'] = clean_price
-                    else:
-                        price_text = re.sub(r'\([^)]*\)', '', price_text).strip()
-                        
-                        if "دلار" in currency_name and len(price_text) > 0 and 'dollar' not in currencies:
-                            logger.info(f"Dollar price with specific selector: {price_text}")
-                            currencies['dollar'] = price_text
-                        
-                        if "یورو" in currency_name and len(price_text) > 0 and 'euro' not in currencies:
-                            logger.info(f"Euro price with specific selector: {price_text}")
-                            currencies['euro'] = price_text
-                        
+                    cells = row.find_elements(By.TAG_NAME, "td")
+                    if len(cells) >= 2:
+                        match_row(cells[0].text.strip(), cells[1], "table")
                 except Exception as e:
-                    logger.warning(f"Error in specific selector: {str(e)}")
-                    continue
-        
-        # Final check
-        if 'dollar' not in currencies:
-            logger.error("Dollar price not found")
-        if 'euro' not in currencies:
-            logger.error("Euro price not found")
-            
-        if not currencies:
-            logger.error("No currency prices found")
-            return None
-            
-        # Convert dictionary keys to farsi for consistency with the rest of the code
-        farsi_currencies = {}
-        if 'dollar' in currencies:
-            farsi_currencies['دلار'] = currencies['dollar']
-        if 'euro' in currencies:
-            farsi_currencies['یورو'] = currencies['euro']
-        
-        return farsi_currencies
-            
-    except Exception as e:
-        logger.error(f"Error getting currency prices: {str(e)}")
-        return None
-    finally:
-        if driver:
+                    logger.warning(f"Error processing table row: {str(e)}")
+                if not remaining:
+                    break
+            if not remaining:
+                break
+
+    # Method 3: Use alternative selectors
+    if remaining:
+        for row in driver.find_elements(By.CSS_SELECTOR, ".market-table-row"):
             try:
-                driver.quit()
-                logger.info("Selenium driver closed")
+                name_element = row.find_element(By.CSS_SELECTOR, ".market-name")
+                price_element = row.find_element(By.CSS_SELECTOR, ".market-price")
+                match_row(name_element.text.strip(), price_element, "market_row")
             except Exception as e:
-                logger.warning(f"Error closing Selenium driver: {str(e)}")
+                logger.warning(f"Error in specific selector: {str(e)}")
+            if not remaining:
+                break
 
-def get_gold_prices(headless=True):
+    if remaining:
+        PRICE_LOOKUPS.inc(len(remaining), method="missing")
+    return found
+
+def extract_page(driver, instruments, mode=None):
     """
-    Get gold prices from the gold page
+    Extract ``instruments`` from an opened page, either in a single script
+    call (DOM_EXTRACTION=script, default) or by walking elements.
+    Returns raw price texts keyed by instrument key.
+    """
+    if mode is None:
+        mode = os.getenv("DOM_EXTRACTION", "script")
+    if mode not in DOM_EXTRACTION_MODES:
+        raise ValueError(f"Unknown DOM extraction mode: {mode}")
+
+    targets = page_targets(instruments)
+    with EXTRACTION_SECONDS.time(engine="selenium", mode=mode):
+        if mode == "walk":
+            return _walk_page(driver, targets)
+        element_ids = [element_id for element_id, _ in targets.values()]
+        found, _ = resolve_prices(read_page_snapshot(driver, element_ids), targets)
+        return found
+
+def get_page_prices_selenium(url, instruments, headless=True):
+    """
+    Open ``url`` in a pooled driver and extract ``instruments`` from it
     """
-    driver = None
     try:
-        logger.info("Getting gold prices...")
-        driver = setup_driver(headless=headless)
-        
-        # Open gold page
-        driver.get(GOLD_URL)
-        logger.info(f"Gold page opened: {GOLD_URL}")
-        
-        # Wait for the page to load completely
-        time.sleep(5)
-        
-        gold_prices = {}
-        
-        # Try to find 18-karat gold price with ID
-        try:
-            gold_element = driver.find_element(By.ID, "l-geram18")
-            if gold_element:
-                price_text = gold_element.text.strip()
-                if price_text:
-                    logger.info(f"18-karat gold price with ID: {price_text}")
-                    # Extract only the price number using regex
-                    import re
-                    # Search for numeric pattern with commas - more precise
-                    price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                    if price_match:
-                        clean_price = price_match.group(1)
-                        logger.info(f"Cleaned 18-karat gold price: {clean_price}")
-                        gold_prices['18k_gold'] = clean_price
-                    else:
-                        gold_prices['18k_gold'] = price_text
-        except Exception as e:
-            logger.warning(f"Error finding 18-karat gold with ID: {str(e)}")
-        
-        # If not found with ID method, try other methods
-        if '18k_gold' not in gold_prices:
-            # Search in tables
-            tables = driver.find_elements(By.CSS_SELECTOR, "table.market-table")
-            
-            for table in tables:
-                rows = table.find_elements(By.TAG_NAME, "tr")
-                
-                for row in rows:
-                    try:
-                        cells = row.find_elements(By.TAG_NAME, "td")
-                        if len(cells) < 2:
-                            continue
-                        
-                        name_cell = cells[0]
-                        gold_name = name_cell.text.strip()
-                        
-                        if "طلای 18 عیار" in gold_name or "یک گرم طلای 18 عیار" in gold_name:
-                            price_cell = cells[1]
-                            price_text = price_cell.text.strip()
-                            # Extract only the price number using regex
-                            import re
-                            # Search for numeric pattern with commas - more precise
-                            price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                            if price_match:
-                                clean_price = price_match.group(1)
-                                logger.info(f"18-karat gold price from table (cleaned): {clean_price}")
-                                gold_prices['18k_gold'] = clean_price
-                            else:
-                                # Remove parentheses and content inside
-                                price_text = re.sub(r'\([^)]*\)', '', price_text).strip()
-                                logger.info(f"18-karat gold price from table: {price_text}")
-                                gold_prices['18k_gold'] = price_text
-                            break
-                    except Exception as e:
-                        logger.warning(f"Error processing gold table row: {str(e)}")
-                        continue
-        
-        # Final check
-        if '18k_gold' not in gold_prices:
-            logger.error("18-karat gold price not found")
-        
-        # Convert dictionary keys to farsi for consistency with the rest of the code
-        farsi_gold = {}
-        if '18k_gold' in gold_prices:
-            farsi_gold['طلای 18 عیار'] = gold_prices['18k_gold']
-            
-        return farsi_gold
-            
+        logger.info(f"Getting prices from {url} with Selenium...")
+        with get_driver_pool(headless).driver() as driver:
+            # Open the page and wait until its prices are populated
+            open_page(driver, url, [instrument.element_id for instrument in instruments])
+            return extract_page(driver, instruments)
     except Exception as e:
-        logger.error(f"Error getting gold prices: {str(e)}")
-        return None
-    finally:
-        if driver:
-            try:
-                driver.quit()
-                logger.info("Gold page Selenium driver closed")
-            except Exception as e:
-                logger.warning(f"Error closing gold page Selenium driver: {str(e)}")
+        ERRORS.inc(component="selenium_page")
+        logger.error(f"Error getting prices from {url}: {str(e)}")
+        return {}
+
+def get_page_prices(url, instruments, headless=True, engine=None, sources=None):
+    """
+    Fetch one page once and extract every instrument listed on it.
+
+    The http engine (PRICE_ENGINE, default) reads the served HTML and only
+    falls back to Selenium for the instruments it could not find. The feed
+    engine reads tgju's JSON live-data feed (one request for every page of
+    a cycle) and falls back to the http engine for what the feed lacks. If
+    a ``sources`` dict is given, it is filled with the engine each key came
+    from.
+    """
+    if engine is None:
+        engine = os.getenv("PRICE_ENGINE", "http")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown price engine: {engine}")
+    if sources is None:
+        sources = {}
+    if engine == "selenium":
+        found = get_page_prices_selenium(url, instruments, headless=headless)
+        sources.update(dict.fromkeys(found, "selenium"))
+        return found
+
+    found = {}
+    if engine == "feed":
+        found, missing = feed_extractor.get_prices(instruments)
+        sources.update(dict.fromkeys(found, "feed"))
+        if not missing:
+            return found
+        logger.info(f"Feed missed {missing}, falling back to {url}")
+        ENGINE_FALLBACKS.inc(len(missing), engine="feed")
+        instruments = [instrument for instrument in instruments if instrument.key in missing]
+
+    page_found, missing = http_extractor.get_page_prices(url, page_targets(instruments))
+    sources.update(dict.fromkeys(page_found, "http"))
+    found.update(page_found)
+    if missing:
+        logger.info(f"HTTP engine missed {missing} on {url}, falling back to Selenium")
+        ENGINE_FALLBACKS.inc(len(missing), engine="http")
+        fallback = [instrument for instrument in instruments if instrument.key in missing]
+        fallback_found = get_page_prices_selenium(url, fallback, headless=headless)
+        sources.update(dict.fromkeys(fallback_found, "selenium"))
+        found.update(fallback_found)
+    return found
+
+def get_category_prices(category, headless=True, engine=None):
+    """
+    Raw price texts of one message section keyed by display name
+    """
+    instruments = [instrument for instrument in get_instruments() if instrument.category == category]
+    prices = {}
+    for url, page_instruments in group_by_page(instruments).items():
+        raw = get_page_prices(url, page_instruments, headless=headless, engine=engine)
+        for instrument in page_instruments:
+            if instrument.key in raw:
+                prices[instrument.display_name] = raw[instrument.key]
+    return prices or None
+
+def get_currency_prices(headless=True):
+    """
+    Get currency prices from the currency page
+    """
+    return get_category_prices('currencies', headless=headless)
+
+def get_gold_prices(headless=True):
+    """
+    Get gold prices from the gold page
+    """
+    return get_category_prices('gold', headless=headless)
 
 def get_coin_prices(headless=True):
     """
     Get coin prices from the coin page
     """
-    driver = None
-    try:
-        logger.info("Getting coin prices...")
-        driver = setup_driver(headless=headless)
-        
-        # Open coin page
-        driver.get(COIN_URL)
-        logger.info(f"Coin page opened: {COIN_URL}")
-        
-        # Wait for the page to load completely
-        time.sleep(5)
-        
-        coin_prices = {}
-        
-        # Try to find Emami coin price with ID
-        try:
-            coin_element = driver.find_element(By.ID, "l-sekee")
-            if coin_element:
-                price_text = coin_element.text.strip()
-                if price_text:
-                    logger.info(f"Emami coin price with ID: {price_text}")
-                    # Extract only the price number using regex
-                    import re
-                    # Search for numeric pattern with commas - more precise
-                    price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                    if price_match:
-                        clean_price = price_match.group(1)
-                        logger.info(f"Cleaned Emami coin price: {clean_price}")
-                        coin_prices['emami_coin'] = clean_price
-                    else:
-                        coin_prices['emami_coin'] = price_text
-        except Exception as e:
-            logger.warning(f"Error finding Emami coin with ID: {str(e)}")
-        
-        # If not found with ID method, try other methods
-        if 'emami_coin' not in coin_prices:
-            # Search in tables
-            tables = driver.find_elements(By.CSS_SELECTOR, "table.market-table")
-            
-            for table in tables:
-                rows = table.find_elements(By.TAG_NAME, "tr")
-                
-                for row in rows:
-                    try:
-                        cells = row.find_elements(By.TAG_NAME, "td")
-                        if len(cells) < 2:
-                            continue
-                        
-                        name_cell = cells[0]
-                        coin_name = name_cell.text.strip()
-                        
-                        if "سکه امامی" in coin_name or "سکه طرح امامی" in coin_name:
-                            price_cell = cells[1]
-                            price_text = price_cell.text.strip()
-                            # Extract only the price number using regex
-                            import re
-                            # Search for numeric pattern with commas - more precise
-                            price_match = re.search(r'(\d{1,3}(?:,\d{3})+)', price_text)
-                            if price_match:
-                                clean_price = price_match.group(1)
-                                logger.info(f"Emami coin price from table (cleaned): {clean_price}")
-                                coin_prices['emami_coin'] = clean_price
-                            else:
-                                # Remove parentheses and content inside
-                                price_text = re.sub(r'\([^)]*\)', '', price_text).strip()
-                                logger.info(f"Emami coin price from table: {price_text}")
-                                coin_prices['emami_coin'] = price_text
-                            break
-                    except Exception as e:
-                        logger.warning(f"Error processing coin table row: {str(e)}")
-                        continue
-        
-        # Final check
-        if 'emami_coin' not in coin_prices:
-            logger.error("Emami coin price not found")
-            
-        # Convert dictionary keys to farsi for consistency with the rest of the code
-        farsi_coin = {}
-        if 'emami_coin' in coin_prices:
-            farsi_coin['سکه امامی'] = coin_prices['emami_coin']
-            
-        return farsi_coin
-            
-    except Exception as e:
-        logger.error(f"Error getting coin prices: {str(e)}")
-        return None
-    finally:
-        if driver:
-            try:
-                driver.quit()
-                logger.info("Coin page Selenium driver closed")
-            except Exception as e:
-                logger.warning(f"Error closing coin page Selenium driver: {str(e)}")
+    return get_category_prices('coin', headless=headless)
 
 def format_price(price_text, is_gold_or_coin=False):
     """
@@ -504,77 +502,161 @@ def format_price(price_text, is_gold_or_coin=False):
     """
     if not price_text:
         return ""
-    
-    # Remove all non-numeric characters except commas and periods
-    price_text = re.sub(r'[^\d,.]', '', price_text)
-    
-    try:
-        # Convert to number
-        price_num = int(price_text.replace(',', '').replace('.', ''))
-        
-        # Check if the price is extremely large (over 10 million)
-        # This catches case where an extra set of digits was added accidentally
-        if price_num > 10000000000:  # If greater than 10 billion
-            logger.warning(f"Very large price detected: {price_num}, adjusting...")
-            # Divide by 10 million to get a reasonable number
-            price_num = price_num // 10000000
-        
-        # Convert rials to tomans (divide by 10)
-        price_num = price_num // 10
-        
-        # Format number
-        return f"{price_num:,}"
-    except Exception as e:
-        logger.error(f"Error converting price: {price_text}, error: {str(e)}")
+    value = parse_price(price_text)
+    if value is None:
+        logger.error(f"Error converting price: {price_text}")
         return price_text  # Return original text if conversion fails
+    return format_value(value, "rial")
+
+def _timed_fetch(url, instruments, headless, engine):
+    started = time.monotonic()
+    sources = {}
+    prices = get_page_prices(url, instruments, headless=headless, engine=engine, sources=sources)
+    return prices, sources, time.monotonic() - started
+
+def get_cached_prices(instruments=None, stale_after=None):
+    """
+    Last-known-good prices of the tracked instruments without scraping
+    """
+    if instruments is None:
+        instruments = get_instruments()
+    return price_cache.view(instruments, stale_after=stale_after)
+
+def get_failed_instruments(instruments=None):
+    """
+    Tracked instruments whose last scrape failed
+    """
+    if instruments is None:
+        instruments = get_instruments()
+    failed = set(price_cache.failed_keys(instruments))
+    return [instrument for instrument in instruments if instrument.key in failed]
 
-def get_all_prices(headless=True):
+def get_all_prices(headless=True, parallel=None, page_timeout=None, engine=None, instruments=None,
+                   cycle_timeout=None, coordinator=None):
     """
-    Get all prices (currency, gold, coin) for use in the Telegram bot
+    Get all tracked prices for use in the Telegram bot
+
+    Instruments are grouped by page so each page is fetched once no matter
+    how many instruments it holds. With ``parallel`` (default on, see
+    SCRAPE_PARALLEL) pages are scraped concurrently and a page that misses
+    ``page_timeout`` is dropped from the result instead of holding back the
+    others. ``cycle_timeout`` caps the whole call: pages still running or not
+    yet started when it expires are left out. With a ``coordinator`` (see
+    scrape_workers) the pages are scraped by its worker processes instead of
+    threads, with the same timeouts.
+
+    Every price found is stored in the last-known-good cache; instruments
+    that could not be scraped are served from the cache, marked ``stale``
+    with their ``age`` in seconds, instead of disappearing from the result.
     """
+    if parallel is None:
+        parallel = os.getenv("SCRAPE_PARALLEL", "1") != "0"
+    if page_timeout is None:
+        page_timeout = float(os.getenv("PAGE_TIMEOUT", DEFAULT_PAGE_TIMEOUT))
+    if cycle_timeout is not None:
+        page_timeout = min(page_timeout, cycle_timeout)
+
     try:
-        # Create dictionary to store all prices
-        all_prices = {}
-        
-        # Get currency prices
-        currency_prices = get_currency_prices(headless=headless)
-        if currency_prices:
-            formatted_currencies = {}
-            for currency_name, price_text in currency_prices.items():
-                formatted_price = format_price(price_text, is_gold_or_coin=False)
-                formatted_currencies[currency_name] = {
-                    "price": formatted_price,
-                    "original_text": price_text
-                }
-            all_prices['currencies'] = formatted_currencies
-        
-        # Get gold prices
-        gold_prices = get_gold_prices(headless=headless)
-        if gold_prices:
-            formatted_gold = {}
-            for gold_name, price_text in gold_prices.items():
-                formatted_price = format_price(price_text, is_gold_or_coin=False)
-                formatted_gold[gold_name] = {
-                    "price": formatted_price,
-                    "original_text": price_text
-                }
-            all_prices['gold'] = formatted_gold
-        
-        # Get coin prices
-        coin_prices = get_coin_prices(headless=headless)
-        if coin_prices:
-            formatted_coin = {}
-            for coin_name, price_text in coin_prices.items():
-                formatted_price = format_price(price_text, is_gold_or_coin=False)
-                formatted_coin[coin_name] = {
-                    "price": formatted_price,
-                    "original_text": price_text
+        if instruments is None:
+            instruments = get_instruments()
+        pages = group_by_page(instruments)
+
+        timings = {}
+        results = {}
+        sources = {}
+        cycle_started = time.monotonic()
+
+        if parallel or coordinator is not None:
+            executor = None
+            if coordinator is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=len(pages),
+                    thread_name_prefix="scrape"
+                )
+            try:
+                futures = {
+                    (
+                        coordinator.submit_page(url, page_instruments, headless, engine)
+                        if coordinator is not None
+                        else executor.submit(_timed_fetch, url, page_instruments, headless, engine)
+                    ): url
+                    for url, page_instruments in pages.items()
                 }
-            all_prices['coin'] = formatted_coin
-        
+                done, not_done = wait(futures, timeout=page_timeout)
+                for future in not_done:
+                    ERRORS.inc(component="page_timeout")
+                    logger.error(f"Timed out scraping {futures[future]} after {page_timeout}s")
+                    timings[futures[future]] = None
+                    future.cancel()
+                for future in done:
+                    url = futures[future]
+                    try:
+                        page_prices, page_sources, timings[url] = future.result()
+                        results.update(page_prices)
+                        sources.update(page_sources)
+                    except Exception as e:
+                        ERRORS.inc(component="scrape_page")
+                        logger.error(f"Error scraping {url}: {str(e)}")
+            finally:
+                # Don't block on pages that overran their timeout
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for url, page_instruments in pages.items():
+                if cycle_timeout is not None and time.monotonic() - cycle_started >= cycle_timeout:
+                    logger.error(f"Cycle timeout reached, skipping {url}")
+                    timings[url] = None
+                    continue
+                try:
+                    page_prices, page_sources, timings[url] = _timed_fetch(url, page_instruments, headless, engine)
+                except Exception as e:
+                    ERRORS.inc(component="scrape_page")
+                    logger.error(f"Error scraping {url}: {str(e)}")
+                    continue
+                results.update(page_prices)
+                sources.update(page_sources)
+
+        # Parse each price once, refresh the cache with the valid ones and
+        # keep the rest as stale
+        scraped_at = time.time()
+        missing = []
+        for instrument in instruments:
+            price = None
+            if instrument.key in results:
+                price = parse_instrument_price(
+                    instrument, results[instrument.key], sources.get(instrument.key, "unknown"), scraped_at
+                )
+            if price is None:
+                missing.append(instrument.key)
+                price_cache.mark_stale(instrument.key)
+            else:
+                price_cache.update(price)
+
+        if missing:
+            logger.error(f"Prices not found: {missing}")
+
+        # Merged view in the usual section and registry order
+        all_prices = price_cache.view(instruments, now=scraped_at)
+
+        timings['total'] = time.monotonic() - cycle_started
+        SCRAPE_CYCLE_SECONDS.observe(timings['total'])
+        last_cycle_timings.clear()
+        last_cycle_timings.update(timings)
+        summary = {k: (round(v, 2) if v is not None else "timeout") for k, v in timings.items()}
+        logger.info(
+            f"Scrape cycle finished in {timings['total']:.2f}s "
+            f"(parallel={parallel}, workers={coordinator.size if coordinator else 0}): {summary}"
+        )
+        if headless in _driver_pools:
+            logger.info(f"Driver pool stats: {_driver_pools[headless].stats()}")
         return all_prices
     except Exception as e:
+        ERRORS.inc(component="scrape_cycle")
         logger.error(f"Error getting all prices: {str(e)}")
+        if instruments is not None:
+            for instrument in instruments:
+                price_cache.mark_stale(instrument.key)
+            return price_cache.view(instruments) or None
         return None
 
 if __name__ == "__main__":
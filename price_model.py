@@ -0,0 +1,72 @@
+import logging
+from dataclasses import dataclass
+
+from price_parsing import parse_price
+
+logger = logging.getLogger(__name__)
+
+# Decimal places stored in the integer value of each unit ("usd" in cents)
+UNIT_DECIMALS = {"rial": 0, "usd": 2}
+
+# Unit labels used in the price message ("rial" prices are shown in tomans)
+UNIT_LABELS = {"rial": "تومان", "usd": "دلار"}
+
+
+@dataclass(frozen=True, slots=True)
+class Price:
+    """
+    One scraped price: integer value (rials, or cents for "usd"), unit,
+    scrape time (epoch seconds) and the engine it came from
+    """
+    key: str
+    value: int
+    unit: str
+    timestamp: float
+    source: str
+
+
+def parse_instrument_value(instrument, price_text):
+    """
+    Integer value of the raw text of one instrument, or None
+    """
+    value = parse_price(price_text, UNIT_DECIMALS.get(instrument.unit, 0))
+    if value is None:
+        logger.warning(f"Could not parse price of {instrument.key}: {price_text!r}")
+    return value
+
+
+def validate_price(instrument, value, source, timestamp):
+    """
+    Price record of a parsed value, or None if it is outside the instrument's valid range
+    """
+    low, high = instrument.valid_range
+    if value < low or (high is not None and value > high):
+        logger.warning(f"Price of {instrument.key} out of range {instrument.valid_range}: {value}")
+        return None
+    return Price(instrument.key, value, instrument.unit, timestamp, source)
+
+
+def parse_instrument_price(instrument, price_text, source, timestamp):
+    """
+    Parse and validate the raw text of one instrument; returns a Price or None
+    """
+    value = parse_instrument_value(instrument, price_text)
+    if value is None:
+        return None
+    return validate_price(instrument, value, source, timestamp)
+
+
+def format_value(value, unit):
+    """
+    Display text of an integer price: rials as tomans, cents as dollars
+    """
+    if unit == "rial":
+        return f"{value // 10:,}"
+    decimals = UNIT_DECIMALS.get(unit, 0)
+    if decimals:
+        return f"{value / 10 ** decimals:,.{decimals}f}"
+    return f"{value:,}"
+
+
+def unit_label(unit):
+    return UNIT_LABELS.get(unit, unit)
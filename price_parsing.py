@@ -0,0 +1,99 @@
+import re
+
+from metrics import PRICE_LOOKUPS
+
+# Persian and Arabic-Indic digits and separators mapped to their ASCII forms
+DIGIT_TRANSLATION = str.maketrans(
+    "۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٬،٫",
+    "01234567890123456789,,.",
+)
+
+# Numbers outside "(...)" change markers: grouped or plain integer part,
+# optional decimal part. Parenthesized text matches without group 1.
+NUMBER_PATTERN = re.compile(r'\([^)]*\)|(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?')
+
+
+def normalize_digits(text):
+    """
+    Replace Persian/Arabic-Indic digits and separators with ASCII ones
+    """
+    return text.translate(DIGIT_TRANSLATION)
+
+
+def parse_price(price_text, decimals=0):
+    """
+    Integer value of a price text in units of ``10 ** -decimals``, or None.
+
+    Handles ASCII, Persian and Arabic-Indic digits and separators and skips
+    "(...)" change markers, in one pass over the text. The first number with
+    thousands separators wins over plain ones, which in a raw cell are
+    usually part of a label ("طلای 18 عیار"); without one the first plain
+    number is used.
+    """
+    if not price_text:
+        return None
+    plain = None
+    for match in NUMBER_PATTERN.finditer(normalize_digits(price_text)):
+        integer_part, fraction = match.groups()
+        if integer_part is None:
+            continue
+        if ',' in integer_part:
+            return _value(integer_part, fraction, decimals)
+        if plain is None:
+            plain = (integer_part, fraction)
+    if plain is None:
+        return None
+    return _value(*plain, decimals)
+
+
+def _value(integer_part, fraction, decimals):
+    value = int(integer_part.replace(',', '')) * 10 ** decimals
+    if decimals and fraction:
+        value += int(fraction[:decimals].ljust(decimals, '0'))
+    return value
+
+
+def _find_in_rows(rows, name_patterns):
+    for name, price_text in rows:
+        if any(pattern in name for pattern in name_patterns):
+            price_text = price_text.strip()
+            if price_text:
+                return price_text
+    return None
+
+
+def resolve_prices(snapshot, targets):
+    """
+    Resolve prices from a page snapshot.
+
+    ``snapshot`` is the compact page structure
+    ``{"ids": {element_id: text}, "tables": [[name, price]], "market_rows": [[name, price]]}``
+    and ``targets`` maps a display name to ``(element_id, name_patterns)``.
+    Each name is looked up by element ID first, then in the market tables and
+    finally in the ``.market-table-row`` entries. Returns ``(found, missing)``
+    with the raw cell texts, which parse_price() reads once downstream.
+    """
+    ids = snapshot.get("ids") or {}
+    tables = snapshot.get("tables") or []
+    market_rows = snapshot.get("market_rows") or []
+
+    found = {}
+    for name, (element_id, name_patterns) in targets.items():
+        price_text = (ids.get(element_id) or "").strip()
+        if price_text:
+            found[name] = price_text
+            PRICE_LOOKUPS.inc(method="id")
+            continue
+        price_text = _find_in_rows(tables, name_patterns)
+        if price_text:
+            found[name] = price_text
+            PRICE_LOOKUPS.inc(method="table")
+            continue
+        price_text = _find_in_rows(market_rows, name_patterns)
+        if price_text:
+            found[name] = price_text
+            PRICE_LOOKUPS.inc(method="market_row")
+    missing = [name for name in targets if name not in found]
+    if missing:
+        PRICE_LOOKUPS.inc(len(missing), method="missing")
+    return found, missing
@@ -0,0 +1,188 @@
+import asyncio
+import html
+import logging
+import time
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent
+from telegram.constants import ParseMode
+from telegram.ext import Application, CommandHandler, InlineQueryHandler
+
+from instruments import get_instruments
+from message_manager import format_price_line, format_price_message
+from metrics import ERRORS, REGISTRY
+from price_extractor_v2 import get_cached_prices, price_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds Telegram may cache an inline answer on its side
+INLINE_CACHE_SECONDS = 30
+# Seconds before the command service is restarted after a failure; doubles
+# up to the maximum while it keeps failing
+COMMANDS_RETRY_SECONDS = 5
+COMMANDS_RETRY_MAX_SECONDS = 300
+
+COMMAND_SECONDS = REGISTRY.histogram(
+    "tgju_command_seconds", "Time to answer a /price command or inline query", ("kind",))
+NO_PRICES_TEXT = "⏳ قیمت‌ها هنوز دریافت نشده‌اند، لطفاً کمی بعد دوباره امتحان کنید."
+
+
+class QuoteCache:
+    """
+    Answers rendered from the in-memory price cache.
+
+    Nothing here scrapes: the texts are rendered from ``price_cache`` at most
+    once per cache version (and per minute, for the age markers), so a burst
+    of requests shares one rendering and reads never wait for a running
+    scrape.
+    """
+
+    def __init__(self, instruments=None, clock=time.time):
+        self.instruments = instruments
+        self.clock = clock
+        self._key = None
+        self._rendered = None
+        self.renders = 0
+
+    def _current(self):
+        now = self.clock()
+        key = (price_cache.version, int(now // 60))
+        if key != self._key:
+            instruments = self.instruments or get_instruments()
+            prices = get_cached_prices(instruments)
+            message = format_price_message(prices) if prices else None
+            lines = {}
+            articles = {}
+            for section in prices.values():
+                for name, data in section.items():
+                    line = format_price_line(name, data).strip()
+                    lines[data["key"]] = (name, line)
+                    articles[data["key"]] = InlineQueryResultArticle(
+                        id=data["key"],
+                        title=name,
+                        description=line,
+                        input_message_content=InputTextMessageContent(line),
+                    )
+            if message:
+                articles["all"] = InlineQueryResultArticle(
+                    id="all",
+                    title="همه قیمت‌ها",
+                    input_message_content=InputTextMessageContent(message, parse_mode=ParseMode.HTML),
+                )
+            self._rendered = {"message": message, "lines": lines, "articles": articles}
+            self._key = key
+            self.renders += 1
+        return self._rendered
+
+    def full_text(self):
+        return self._current()["message"] or NO_PRICES_TEXT
+
+    def find(self, query):
+        """
+        ``(key, name, line)`` of the instruments whose key or name contains ``query``
+        """
+        query = (query or "").strip().lower()
+        return [
+            (key, name, line)
+            for key, (name, line) in self._current()["lines"].items()
+            if not query or query in key.lower() or query in name
+        ]
+
+    def answer(self, query=None):
+        """
+        Text answer of /price [query]
+        """
+        if not query:
+            return self.full_text()
+        matches = self.find(query)
+        if not matches:
+            # Replies are sent as HTML, so the echoed query must not carry markup
+            return f"نمادی با «{html.escape(query)}» پیدا نشد."
+        return "\n".join(line for _, _, line in matches)
+
+    def inline_results(self, query):
+        """
+        Prebuilt inline articles matching ``query`` (all prices first when it is empty)
+        """
+        articles = self._current()["articles"]
+        results = []
+        if not (query or "").strip() and "all" in articles:
+            results.append(articles["all"])
+        results.extend(articles[key] for key, _, _ in self.find(query))
+        return results
+
+
+def build_application(token, quotes, send_queue, base_url=None, request=None):
+    """
+    Application that answers /price and inline queries from ``quotes``;
+    replies go through ``send_queue`` like every other send
+    """
+    # Handle updates concurrently so one slow reply never holds back the next
+    builder = Application.builder().token(token).concurrent_updates(True)
+    if base_url:
+        builder = builder.base_url(base_url)
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+
+    async def price_command(update, context):
+        started = time.monotonic()
+        query = " ".join(context.args) if context.args else None
+        text = quotes.answer(query)
+        COMMAND_SECONDS.observe(time.monotonic() - started, kind="render")
+        await send_queue.send_message(
+            chat_id=update.effective_chat.id,
+            text=text,
+            parse_mode=ParseMode.HTML,
+            reply_to_message_id=update.effective_message.message_id,
+            # Ahead of channel publishing, so a reply never waits for a publish round
+            priority=True,
+        )
+        COMMAND_SECONDS.observe(time.monotonic() - started, kind="command")
+
+    async def inline_query(update, context):
+        started = time.monotonic()
+        results = quotes.inline_results(update.inline_query.query)
+        await update.inline_query.answer(results[:50], cache_time=INLINE_CACHE_SECONDS)
+        COMMAND_SECONDS.observe(time.monotonic() - started, kind="inline")
+
+    application.add_handler(CommandHandler(["price", "start"], price_command))
+    application.add_handler(InlineQueryHandler(inline_query))
+    return application
+
+
+async def _poll_commands(application):
+    async with application:
+        await application.start()
+        await application.updater.start_polling(allowed_updates=["message", "inline_query"])
+        logger.info("Answering /price and inline queries")
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await application.updater.stop()
+            await application.stop()
+
+
+async def serve_commands(application, retry=COMMANDS_RETRY_SECONDS, max_retry=COMMANDS_RETRY_MAX_SECONDS):
+    """
+    Poll for commands and inline queries until cancelled.
+
+    A failure (getMe rejected at startup, a revoked token, a network error)
+    is logged and the service restarts after a backoff, so it never reaches
+    the caller.
+    """
+    loop = asyncio.get_running_loop()
+    delay = retry
+    while True:
+        started = loop.time()
+        try:
+            await _poll_commands(application)
+        except Exception as e:
+            ERRORS.inc(component="commands")
+            logger.error(f"Command service failed: {e}")
+        if loop.time() - started > max_retry:
+            # It ran for a while, so this is a new failure rather than a repeat
+            delay = retry
+        logger.info(f"Restarting the command service in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_retry)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Longest single sleep while waiting for a wall-clock event, so clock
+# adjustments and suspends are noticed quickly
+MAX_WALL_CLOCK_SLEEP = 30
+
+
+async def run_at_fixed_rate(job, interval, name="job"):
+    """
+    Run ``job`` every ``interval`` seconds on monotonic deadlines.
+
+    Ticks are anchored to the start time, so the period does not drift by
+    the job's own duration. If a run overruns one or more ticks, those ticks
+    are skipped instead of being fired back to back.
+    """
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
+    while True:
+        try:
+            await job()
+        except Exception as e:
+            logger.error(f"Error in scheduled job {name}: {e}")
+
+        now = loop.time()
+        next_tick += interval
+        if next_tick <= now:
+            skipped = int((now - next_tick) // interval) + 1
+            next_tick += skipped * interval
+            logger.warning(f"{name} overran its period, skipped {skipped} tick(s)")
+        await asyncio.sleep(next_tick - now)
+
+
+def _localize(tz, day, at):
+    naive = datetime.combine(day, at)
+    # pytz zones need localize(), zoneinfo zones accept tzinfo directly
+    if hasattr(tz, "localize"):
+        return tz.localize(naive)
+    return naive.replace(tzinfo=tz)
+
+
+def next_daily_run(now, times, tz):
+    """
+    First occurrence of any of ``times`` (wall-clock, in ``tz``) strictly after ``now``
+    """
+    now = now.astimezone(tz)
+    for days in (0, 1):
+        day = now.date() + timedelta(days=days)
+        candidates = sorted(_localize(tz, day, at) for at in times)
+        for candidate in candidates:
+            if candidate > now:
+                return candidate
+    raise ValueError("No daily times given")
+
+
+def last_daily_run(now, times, tz):
+    """
+    Most recent occurrence of any of ``times`` at or before ``now``
+    """
+    now = now.astimezone(tz)
+    for days in (0, 1):
+        day = now.date() - timedelta(days=days)
+        candidates = sorted((_localize(tz, day, at) for at in times), reverse=True)
+        for candidate in candidates:
+            if candidate <= now:
+                return candidate
+    raise ValueError("No daily times given")
+
+
+async def run_daily(job, times, tz, name="daily job"):
+    """
+    Run ``job`` exactly at each of the wall-clock ``times`` every day
+    """
+    while True:
+        target = next_daily_run(datetime.now(tz), times, tz)
+        logger.info(f"{name} scheduled for {target.strftime('%Y-%m-%d %H:%M:%S')}")
+        while True:
+            remaining = (target - datetime.now(tz)).total_seconds()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, MAX_WALL_CLOCK_SLEEP))
+        try:
+            await job()
+        except Exception as e:
+            logger.error(f"Error in scheduled job {name}: {e}")
@@ -0,0 +1,332 @@
+import logging
+import multiprocessing
+import threading
+import time
+import zlib
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from multiprocessing.connection import wait as wait_connections
+
+from metrics import ERRORS, REGISTRY, SCRAPE_REASSIGNMENTS, SCRAPE_WORKER_RESTARTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+# Pages one worker scrapes at once (its driver pool has DRIVER_POOL_SIZE browsers)
+DEFAULT_WORKER_THREADS = 3
+# Seconds between heartbeats of a worker, and of silence before it is
+# considered dead and replaced
+HEARTBEAT_INTERVAL = 2.0
+HEARTBEAT_TIMEOUT = 15.0
+# Times a page is handed to a worker before its future fails
+MAX_ATTEMPTS = 2
+
+
+def _scrape_task(task, send):
+    import price_extractor_v2
+
+    task_id, url, instruments, headless, engine = task
+    started = time.monotonic()
+    try:
+        sources = {}
+        prices = price_extractor_v2.get_page_prices(
+            url, instruments, headless=headless, engine=engine, sources=sources
+        )
+        send("result", (task_id, (prices, sources, time.monotonic() - started)))
+    except Exception as e:
+        send("error", (task_id, str(e)))
+
+
+def _worker_main(slot, generation, tasks, results, heartbeat_interval, threads):
+    """
+    Worker process: scrape the pages put on ``tasks`` (``threads`` at a
+    time) with its own driver pool and send results, errors and heartbeats
+    over its ``results`` pipe.
+
+    Messages are plain ``(kind, slot, generation, body, samples)`` tuples,
+    so the pipes can be swapped for a network transport to run workers on
+    other nodes. ``samples`` are the metrics recorded here since the last
+    message, which the coordinator adds to its own registry.
+    """
+    import price_extractor_v2
+
+    stop = threading.Event()
+    # Connection.send() is not safe to call from several threads at once
+    send_lock = threading.Lock()
+
+    def send(kind, body=None):
+        with send_lock:
+            results.send((kind, slot, generation, body, REGISTRY.drain()))
+
+    def beat():
+        while not stop.wait(heartbeat_interval):
+            send("heartbeat")
+
+    # A thread, so heartbeats keep coming while a page is loading
+    threading.Thread(target=beat, name="heartbeat", daemon=True).start()
+    send("heartbeat")
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="scrape")
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            executor.submit(_scrape_task, task, send)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        stop.set()
+        price_extractor_v2.close_driver_pools()
+
+
+class _Worker:
+    __slots__ = ("slot", "generation", "process", "tasks", "results", "last_seen", "ready", "pending")
+
+    def __init__(self, slot, generation, process, tasks, results):
+        self.slot = slot
+        self.generation = generation
+        self.process = process
+        self.tasks = tasks
+        self.results = results
+        self.last_seen = time.monotonic()
+        self.ready = False
+        self.pending = set()
+
+
+class _Task:
+    __slots__ = ("id", "url", "instruments", "headless", "engine", "future", "slot", "attempts")
+
+    def __init__(self, task_id, url, instruments, headless, engine):
+        self.id = task_id
+        self.url = url
+        self.instruments = instruments
+        self.headless = headless
+        self.engine = engine
+        self.future = Future()
+        self.slot = None
+        self.attempts = 0
+
+
+class ScrapeCoordinator:
+    """
+    Spreads page scrapes over a pool of worker processes.
+
+    Each page goes to the least busy worker, preferring the one its URL
+    hashes to so a page keeps landing on the same warm browser. Each worker
+    has its own task queue and result pipe, so killing a stuck worker can
+    only break channels that are dropped with it. A worker that exits or
+    stays silent for ``heartbeat_timeout`` seconds is replaced and its
+    unfinished pages are handed to the others.
+
+    ``submit_page()`` returns a ``concurrent.futures.Future`` resolving to
+    ``(prices, sources, elapsed)``, like a page fetched on a thread pool.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, threads=DEFAULT_WORKER_THREADS, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 heartbeat_timeout=HEARTBEAT_TIMEOUT, max_attempts=MAX_ATTEMPTS, start_method="spawn"):
+        self.size = max(1, int(workers))
+        self.threads = max(1, int(threads))
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self._context = multiprocessing.get_context(start_method)
+        self._workers = {}
+        self._tasks = {}
+        self._next_task_id = 1
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._collector = None
+        self.restarts = 0
+
+    def start(self):
+        with self._lock:
+            for slot in range(self.size):
+                self._spawn(slot)
+        self._collector = threading.Thread(target=self._collect, name="scrape-coordinator", daemon=True)
+        self._collector.start()
+        logger.info(f"Started {self.size} scrape workers")
+        return self
+
+    def _spawn(self, slot):
+        self._generation += 1
+        tasks = self._context.Queue()
+        results, results_writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(slot, self._generation, tasks, results_writer, self.heartbeat_interval, self.threads),
+            name=f"scrape-worker-{slot}",
+            daemon=True,
+        )
+        process.start()
+        # Only the worker writes, so the pipe reports EOF once it exits
+        results_writer.close()
+        self._workers[slot] = _Worker(slot, self._generation, process, tasks, results)
+
+    @staticmethod
+    def _drop(worker):
+        """
+        Close the channels of a worker that is gone
+        """
+        worker.results.close()
+        # Don't let exit wait to flush tasks nobody will read
+        worker.tasks.cancel_join_thread()
+        worker.tasks.close()
+
+    # Assignment
+
+    def submit_page(self, url, instruments, headless=True, engine=None):
+        with self._lock:
+            if self._closed.is_set():
+                raise RuntimeError("scrape coordinator is stopped")
+            task = _Task(self._next_task_id, url, list(instruments), headless, engine)
+            self._next_task_id += 1
+            self._tasks[task.id] = task
+            self._assign(task)
+        return task.future
+
+    def _assign(self, task):
+        preferred = zlib.crc32(task.url.encode("utf-8")) % self.size
+        worker = min(
+            self._workers.values(),
+            key=lambda worker: (not worker.ready, len(worker.pending), worker.slot != preferred),
+        )
+        task.slot = worker.slot
+        task.attempts += 1
+        worker.pending.add(task.id)
+        worker.tasks.put((task.id, task.url, task.instruments, task.headless, task.engine))
+
+    # Results and liveness
+
+    def _collect(self):
+        while not self._closed.is_set():
+            try:
+                with self._lock:
+                    readers = {worker.results: worker for worker in self._workers.values()}
+                for reader in wait_connections(list(readers), timeout=0.5):
+                    try:
+                        message = reader.recv()
+                    except (EOFError, OSError):
+                        # The worker exited; give _check_workers a chance to see it
+                        readers[reader].process.join(timeout=1)
+                        continue
+                    self._handle(*message)
+                self._check_workers()
+            except Exception as e:
+                ERRORS.inc(component="scrape_coordinator")
+                logger.error(f"Scrape coordinator error: {e}")
+
+    def _handle(self, kind, slot, generation, body, samples):
+        # Scrape timings, lookups and errors are recorded in the worker;
+        # /metrics is served from this process
+        REGISTRY.merge(samples)
+        with self._lock:
+            worker = self._workers.get(slot)
+            if worker is None or worker.generation != generation:
+                # From a worker that was already replaced
+                return
+            worker.last_seen = time.monotonic()
+            worker.ready = True
+            if kind == "heartbeat":
+                return
+            task_id, value = body
+            worker.pending.discard(task_id)
+            task = self._tasks.pop(task_id, None)
+        if task is None:
+            return
+        try:
+            if kind == "result":
+                task.future.set_result(value)
+            else:
+                task.future.set_exception(RuntimeError(f"{task.url}: {value}"))
+        except InvalidStateError:
+            # Cancelled by a caller that stopped waiting
+            pass
+
+    def _check_workers(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._closed.is_set():
+                return
+            for slot, worker in list(self._workers.items()):
+                if not worker.process.is_alive():
+                    self._replace(slot, f"exited with code {worker.process.exitcode}")
+                elif now - worker.last_seen > self.heartbeat_timeout:
+                    self._replace(slot, f"silent for {now - worker.last_seen:.1f}s")
+
+    def _replace(self, slot, reason):
+        worker = self._workers[slot]
+        ERRORS.inc(component="scrape_worker")
+        SCRAPE_WORKER_RESTARTS.inc()
+        self.restarts += 1
+        logger.error(f"Scrape worker {slot} (pid {worker.process.pid}) {reason}, replacing it")
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=1)
+        self._drop(worker)
+        self._spawn(slot)
+
+        for task_id in sorted(worker.pending):
+            task = self._tasks.get(task_id)
+            if task is None:
+                continue
+            if task.future.done():
+                del self._tasks[task_id]
+            elif task.attempts >= self.max_attempts:
+                del self._tasks[task_id]
+                task.future.set_exception(RuntimeError(f"{task.url}: worker {reason}"))
+            else:
+                SCRAPE_REASSIGNMENTS.inc()
+                self._assign(task)
+                logger.info(f"Reassigned {task.url} to scrape worker {task.slot}")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "restarts": self.restarts,
+                "workers": {
+                    slot: {
+                        "pid": worker.process.pid,
+                        "pending": len(worker.pending),
+                        "last_seen": round(now - worker.last_seen, 1),
+                    }
+                    for slot, worker in self._workers.items()
+                },
+            }
+
+    def stop(self, timeout=5.0):
+        """
+        Ask the workers to exit and kill those still running after
+        ``timeout`` seconds; unfinished pages fail
+        """
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+            workers = list(self._workers.values())
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+        # The collector would otherwise replace the workers as they exit
+        if self._collector is not None:
+            self._collector.join(timeout=2)
+        for worker in workers:
+            worker.tasks.put(None)
+        # Keep reading while they finish, so none blocks on a full pipe
+        deadline = time.monotonic() + timeout
+        readers = [worker.results for worker in workers]
+        while readers and time.monotonic() < deadline:
+            for reader in wait_connections(readers, timeout=max(0.0, deadline - time.monotonic())):
+                try:
+                    REGISTRY.merge(reader.recv()[4])
+                except (EOFError, OSError):
+                    readers.remove(reader)
+        for worker in workers:
+            worker.process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join(timeout=1)
+            self._drop(worker)
+        for task in tasks:
+            if not task.future.done():
+                task.future.set_exception(RuntimeError("scrape coordinator stopped"))
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE = "bot_state.json"
+DEFAULT_FLUSH_INTERVAL = 5.0
+STATE_VERSION = 1
+
+
+class StateStore:
+    """
+    In-process bot state, loaded once and persisted with write-behind.
+
+    Readers and writers work on plain dicts in memory; writers call
+    ``mark_dirty()`` and the state is written at most every
+    ``flush_interval`` seconds (and on ``flush()``/shutdown) to a temporary
+    file that atomically replaces ``path``, so a crash never leaves a torn
+    state file behind.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._data = {"version": STATE_VERSION}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.writes = 0
+
+    def load(self):
+        """
+        Load the state file; returns False when there was none yet
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Could not read state file {self.path}: {e}")
+            return False
+        data.setdefault("version", STATE_VERSION)
+        self._data = data
+        return True
+
+    def section(self, name):
+        """
+        Top-level dict ``name``, created on first use
+        """
+        return self._data.setdefault(name, {})
+
+    def channel(self, channel_id):
+        """
+        State of one channel: last message ID, last send time and price message IDs
+        """
+        channels = self.section("channels")
+        state = channels.get(str(channel_id))
+        if state is None:
+            state = {"last_message_id": None, "last_send_time": None, "price_message_ids": []}
+            channels[str(channel_id)] = state
+        return state
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def flush(self):
+        """
+        Write the state if it changed since the last flush
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._dirty = False
+            payload = json.dumps(self._data, ensure_ascii=False, indent=1)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                fd, tmp_path = tempfile.mkstemp(prefix=".state-", dir=directory)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self.writes += 1
+                return True
+            except Exception as e:
+                self._dirty = True
+                logger.error(f"Could not write state file {self.path}: {e}")
+                try:
+                    os.unlink(tmp_path)
+                except Exception:
+                    pass
+                return False
+
+    async def run_write_behind(self):
+        """
+        Periodically flush pending changes; flushes once more when cancelled
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                self.flush()
+        finally:
+            self.flush()
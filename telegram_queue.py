@@ -0,0 +1,323 @@
+import asyncio
+import logging
+from collections import deque
+from itertools import chain
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+
+from metrics import ERRORS, TELEGRAM_REQUEST_SECONDS, TELEGRAM_RETRY_AFTER
+
+logger = logging.getLogger(__name__)
+
+# Telegram's documented limits: ~30 messages per second overall and
+# 20 messages per minute to the same group or channel
+DEFAULT_GLOBAL_RATE = 30.0
+DEFAULT_CHAT_RATE_PER_MINUTE = 20.0
+DEFAULT_CHAT_BURST = 3
+DEFAULT_MAX_IN_FLIGHT = 20
+DEFAULT_MAX_RETRIES = 3
+
+# Methods that count against the per-chat limit (deletes only use the global one)
+CHAT_LIMITED_METHODS = {"send_message", "edit_message_text"}
+
+# Number of recent queue waits kept for percentiles
+WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """
+    Classic token bucket: ``rate`` tokens per second, at most ``capacity`` stored
+    """
+
+    def __init__(self, rate, capacity, now=0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now):
+        """
+        Seconds until a token is available (0 if one is available now)
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _Request:
+    __slots__ = ("method", "chat_id", "kwargs", "futures", "enqueued_at", "attempts", "key", "priority")
+
+    def __init__(self, method, chat_id, kwargs, future, enqueued_at, key=None, priority=False):
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.futures = [future]
+        self.enqueued_at = enqueued_at
+        self.attempts = 0
+        self.key = key
+        self.priority = priority
+
+    def resolve(self, result=None, exception=None):
+        for future in self.futures:
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+
+class SendQueue:
+    """
+    Rate-limited outbound queue in front of a ``telegram.Bot``.
+
+    Exposes ``send_message``, ``edit_message_text``, ``delete_message`` and
+    ``delete_messages`` with the Bot signatures, so it can be passed wherever a bot is used.
+    Requests are released through a global and a per-chat token bucket,
+    ``RetryAfter`` pauses the affected chat and requeues the request, and
+    queued edits of the same message are coalesced so only the latest text
+    is sent. ``send_message(..., priority=True)`` (interactive replies) goes
+    ahead of everything queued, still within the rate limits.
+    """
+
+    def __init__(
+        self,
+        bot,
+        global_rate=DEFAULT_GLOBAL_RATE,
+        chat_rate_per_minute=DEFAULT_CHAT_RATE_PER_MINUTE,
+        chat_burst=DEFAULT_CHAT_BURST,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_retries=DEFAULT_MAX_RETRIES,
+    ):
+        self.bot = bot
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate_per_minute / 60.0
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._max_in_flight = max_in_flight
+        self._queue = deque()
+        self._priority_queue = deque()
+        self._pending_edits = {}
+        self._chat_buckets = {}
+        self._chat_paused_until = {}
+        self._global_bucket = None
+        self._in_flight = None
+        self._in_flight_count = 0
+        self._wakeup = None
+        self._worker = None
+        # Dispatches in flight; the event loop only keeps weak references to tasks
+        self._tasks = set()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._counters = {
+            "enqueued": 0,
+            "dispatched": 0,
+            "coalesced": 0,
+            "retry_after": 0,
+            "failed": 0,
+        }
+
+    # Public Bot-like API
+
+    async def send_message(self, chat_id, text, priority=False, **kwargs):
+        return await self._submit(
+            "send_message", chat_id, dict(chat_id=chat_id, text=text, **kwargs), priority=priority
+        )
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        kwargs = dict(chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+        return await self._submit("edit_message_text", chat_id, kwargs, key=(chat_id, message_id))
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        kwargs = dict(chat_id=chat_id, message_id=message_id, **kwargs)
+        return await self._submit("delete_message", chat_id, kwargs)
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        kwargs = dict(chat_id=chat_id, message_ids=list(message_ids), **kwargs)
+        return await self._submit("delete_messages", chat_id, kwargs)
+
+    def __getattr__(self, name):
+        # Anything not rate limited here goes straight to the bot
+        if name == "bot":
+            raise AttributeError(name)
+        return getattr(self.bot, name)
+
+    # Lifecycle
+
+    def start(self):
+        if self._worker is None:
+            loop = asyncio.get_running_loop()
+            self._global_bucket = TokenBucket(self.global_rate, max(1.0, self.global_rate), loop.time())
+            self._in_flight = asyncio.Semaphore(self._max_in_flight)
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run(), name="telegram-send-queue")
+        return self
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # Let the requests already sent get their responses
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for queue in (self._priority_queue, self._queue):
+            while queue:
+                queue.popleft().resolve(exception=RuntimeError("Send queue stopped"))
+        self._pending_edits.clear()
+
+    # Metrics
+
+    def metrics(self):
+        """
+        Queue depth, wait times (seconds) and counters
+        """
+        waits = sorted(self._waits)
+        metrics = dict(self._counters)
+        metrics["depth"] = len(self._queue) + len(self._priority_queue)
+        metrics["pending_edits"] = len(self._pending_edits)
+        metrics["in_flight"] = self._in_flight_count
+        if waits:
+            metrics["wait_avg"] = round(sum(waits) / len(waits), 3)
+            metrics["wait_p95"] = round(waits[int(0.95 * (len(waits) - 1))], 3)
+            metrics["wait_max"] = round(waits[-1], 3)
+        return metrics
+
+    # Internals
+
+    async def _submit(self, method, chat_id, kwargs, key=None, priority=False):
+        if self._worker is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._counters["enqueued"] += 1
+
+        pending = self._pending_edits.get(key) if key is not None else None
+        if pending is not None:
+            # Newer text replaces the queued one; both callers get the same result
+            pending.kwargs = kwargs
+            pending.futures.append(future)
+            self._counters["coalesced"] += 1
+        else:
+            request = _Request(method, chat_id, kwargs, future, loop.time(), key, priority)
+            (self._priority_queue if priority else self._queue).append(request)
+            if key is not None:
+                self._pending_edits[key] = request
+            self._wakeup.set()
+        return await future
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _next_ready(self, now):
+        """
+        First queued request allowed to go now, otherwise the shortest wait
+        """
+        global_delay = self._global_bucket.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+        shortest = None
+        for request in chain(self._priority_queue, self._queue):
+            delay = max(0.0, self._chat_paused_until.get(request.chat_id, 0.0) - now)
+            if request.method in CHAT_LIMITED_METHODS:
+                delay = max(delay, self._chat_bucket(request.chat_id, now).delay(now))
+            if delay == 0:
+                return request, 0.0
+            shortest = delay if shortest is None else min(shortest, delay)
+        return None, shortest
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue and not self._priority_queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = loop.time()
+            request, delay = self._next_ready(now)
+            if request is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._in_flight.acquire()
+            self._in_flight_count += 1
+            now = loop.time()
+            (self._priority_queue if request.priority else self._queue).remove(request)
+            if request.key is not None and self._pending_edits.get(request.key) is request:
+                del self._pending_edits[request.key]
+            self._global_bucket.consume(now)
+            if request.method in CHAT_LIMITED_METHODS:
+                self._chat_bucket(request.chat_id, now).consume(now)
+            self._waits.append(now - request.enqueued_at)
+            task = asyncio.create_task(self._dispatch(request))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, request):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            try:
+                result = await getattr(self.bot, request.method)(**request.kwargs)
+            finally:
+                TELEGRAM_REQUEST_SECONDS.observe(loop.time() - started, method=request.method)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            self._counters["retry_after"] += 1
+            TELEGRAM_RETRY_AFTER.inc(method=request.method)
+            self._chat_paused_until[request.chat_id] = loop.time() + float(retry_after)
+            logger.warning(
+                f"Telegram asked to retry {request.method} in {request.chat_id} after {retry_after}s"
+            )
+            self._requeue(request, e)
+        except Exception as e:
+            self._counters["failed"] += 1
+            ERRORS.inc(component=f"telegram_{request.method}")
+            request.resolve(exception=e)
+        else:
+            self._counters["dispatched"] += 1
+            request.resolve(result)
+        finally:
+            self._in_flight_count -= 1
+            self._in_flight.release()
+            self._wakeup.set()
+
+    def _requeue(self, request, error):
+        if request.attempts >= self.max_retries:
+            self._counters["failed"] += 1
+            request.resolve(exception=error)
+            return
+        request.attempts += 1
+        if request.key is not None:
+            newer = self._pending_edits.get(request.key)
+            if newer is not None:
+                # A newer edit is already queued, it answers this one's callers too
+                newer.futures.extend(request.futures)
+                self._counters["coalesced"] += 1
+                return
+            self._pending_edits[request.key] = request
+        (self._priority_queue if request.priority else self._queue).appendleft(request)
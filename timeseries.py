@@ -0,0 +1,211 @@
+import logging
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DIR = "history"
+# One week of minute samples per chunk
+DEFAULT_CHUNK_SIZE = 7 * 24 * 60
+
+# Common downsampling bucket sizes in seconds
+BUCKETS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# Sealed chunks are columnar: header, then all timestamps, then all values
+CHUNK_MAGIC = b"TSC1"
+CHUNK_HEADER = struct.Struct("<4sI")
+CHUNK_SUFFIX = ".chunk"
+# The open chunk is an append-only log of (timestamp, value) rows
+LOG_ROW = struct.Struct("<qq")
+LOG_SUFFIX = ".log"
+
+
+class _Chunk:
+    __slots__ = ("start", "timestamps", "values")
+
+    def __init__(self, start):
+        self.start = start
+        self.timestamps = array("q")
+        self.values = array("q")
+
+
+class Series:
+    """
+    Append-only integer time series of one instrument, stored as chunks
+    of ``array('q')`` columns
+    """
+
+    def __init__(self, directory, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self._log = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        return sum(len(chunk.timestamps) for chunk in self.chunks)
+
+    @property
+    def last_timestamp(self):
+        if self.chunks and self.chunks[-1].timestamps:
+            return self.chunks[-1].timestamps[-1]
+        return None
+
+    def _path(self, start, suffix):
+        return os.path.join(self.directory, f"{start}{suffix}")
+
+    def _load(self):
+        names = sorted(
+            (name for name in os.listdir(self.directory) if name.endswith((CHUNK_SUFFIX, LOG_SUFFIX))),
+            key=lambda name: int(name.split(".", 1)[0]),
+        )
+        for name in names:
+            start = int(name.split(".", 1)[0])
+            chunk = _Chunk(start)
+            with open(os.path.join(self.directory, name), "rb") as f:
+                data = f.read()
+            if name.endswith(CHUNK_SUFFIX):
+                magic, count = CHUNK_HEADER.unpack_from(data)
+                if magic != CHUNK_MAGIC:
+                    logger.error(f"Skipping unknown chunk file {name}")
+                    continue
+                offset = CHUNK_HEADER.size
+                chunk.timestamps.frombytes(data[offset:offset + 8 * count])
+                chunk.values.frombytes(data[offset + 8 * count:offset + 16 * count])
+            else:
+                # Ignore a torn trailing row
+                usable = len(data) - len(data) % LOG_ROW.size
+                for timestamp, value in LOG_ROW.iter_unpack(data[:usable]):
+                    chunk.timestamps.append(timestamp)
+                    chunk.values.append(value)
+            self.chunks.append(chunk)
+
+    def _seal(self, chunk):
+        payload = CHUNK_HEADER.pack(CHUNK_MAGIC, len(chunk.timestamps))
+        tmp_path = self._path(chunk.start, CHUNK_SUFFIX + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            chunk.timestamps.tofile(f)
+            chunk.values.tofile(f)
+        os.replace(tmp_path, self._path(chunk.start, CHUNK_SUFFIX))
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        log_path = self._path(chunk.start, LOG_SUFFIX)
+        if os.path.exists(log_path):
+            os.unlink(log_path)
+
+    def append(self, timestamp, value):
+        """
+        Append one sample; samples not newer than the last one are rejected,
+        so a cached price recorded again is not counted twice
+        """
+        last = self.last_timestamp
+        if last is not None and timestamp <= last:
+            if timestamp < last:
+                logger.warning(f"Ignoring out-of-order sample {timestamp} < {last} in {self.directory}")
+            return False
+
+        chunk = self.chunks[-1] if self.chunks else None
+        if chunk is None or len(chunk.timestamps) >= self.chunk_size:
+            if chunk is not None:
+                self._seal(chunk)
+            chunk = _Chunk(timestamp)
+            self.chunks.append(chunk)
+
+        chunk.timestamps.append(timestamp)
+        chunk.values.append(value)
+        if self._log is None:
+            self._log = open(self._path(chunk.start, LOG_SUFFIX), "ab")
+        self._log.write(LOG_ROW.pack(timestamp, value))
+        return True
+
+    def range(self, start, end):
+        """
+        Samples with ``start <= timestamp < end`` as two arrays
+        """
+        timestamps = array("q")
+        values = array("q")
+        starts = [chunk.start for chunk in self.chunks]
+        index = max(0, bisect_right(starts, start) - 1)
+        for chunk in self.chunks[index:]:
+            if chunk.start >= end:
+                break
+            lo = bisect_left(chunk.timestamps, start)
+            hi = bisect_left(chunk.timestamps, end)
+            if lo < hi:
+                timestamps.extend(chunk.timestamps[lo:hi])
+                values.extend(chunk.values[lo:hi])
+        return timestamps, values
+
+    def flush(self):
+        if self._log is not None:
+            self._log.flush()
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def ohlc(timestamps, values, bucket, offset=0):
+    """
+    Downsample samples into ``(bucket_start, open, high, low, close, count)``
+    rows. ``offset`` shifts bucket boundaries, e.g. 12600 for Tehran days.
+    """
+    rows = []
+    lo = 0
+    total = len(timestamps)
+    while lo < total:
+        timestamp = timestamps[lo]
+        bucket_start = timestamp - (timestamp + offset) % bucket
+        # Bucket edges by bisection, aggregates over array slices
+        hi = bisect_left(timestamps, bucket_start + bucket, lo)
+        window = values[lo:hi]
+        rows.append((bucket_start, window[0], max(window), min(window), window[-1], hi - lo))
+        lo = hi
+    return rows
+
+
+class TimeSeriesStore:
+    """
+    Price history of all instruments, one ``Series`` directory per instrument key
+    """
+
+    def __init__(self, directory=DEFAULT_HISTORY_DIR, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self._series = {}
+
+    def series(self, key):
+        series = self._series.get(key)
+        if series is None:
+            series = Series(os.path.join(self.directory, key), self.chunk_size)
+            self._series[key] = series
+        return series
+
+    def append(self, key, timestamp, value):
+        return self.series(key).append(int(timestamp), int(value))
+
+    def range(self, key, start, end):
+        return self.series(key).range(start, end)
+
+    def ohlc(self, key, start, end, bucket, offset=0):
+        """
+        OHLC rows of ``key`` between ``start`` and ``end``; ``bucket`` is
+        seconds or one of BUCKETS ("1m", "1h", "1d", ...)
+        """
+        bucket = BUCKETS.get(bucket, bucket)
+        timestamps, values = self.range(key, start, end)
+        return ohlc(timestamps, values, bucket, offset)
+
+    def flush(self):
+        for series in self._series.values():
+            series.flush()
+
+    def close(self):
+        for series in self._series.values():
+            series.close()